@@ -2,8 +2,9 @@ from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.api import deps
+from app.core.deadline import DeadlineExceeded
 from app.schemas.user import User
-from app.services.ai_service import AIService
+from app.services.ai_service import get_ai_service
 from app.schemas.ai import (
     CommandRequest,
     CommandResponse,
@@ -14,10 +15,10 @@ from app.schemas.ai import (
 )
 
 router = APIRouter()
-ai_service = AIService()
+ai_service = get_ai_service()
 
 @router.post("/generate-command", response_model=CommandResponse)
-def generate_command(
+async def generate_command(
     *,
     request: CommandRequest,
     current_user: User = Depends(deps.get_current_user),
@@ -27,13 +28,20 @@ def generate_command(
     Generate Linux CLI commands based on user request
     """
     try:
-        command = ai_service.generate_command(request.task_description)
-        return CommandResponse(command=command)
+        commands = await ai_service.generate_command_alternatives(
+            request.task_description, request.num_alternatives
+        )
+        return CommandResponse(
+            command=commands[0],
+            alternatives=commands if request.num_alternatives > 1 else None
+        )
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/generate-script", response_model=ScriptResponse)
-def generate_script(
+async def generate_script(
     *,
     request: ScriptRequest,
     current_user: User = Depends(deps.get_current_user),
@@ -43,17 +51,23 @@ def generate_script(
     Generate automation scripts (Bash, Python, Ansible, etc.)
     """
     try:
-        script = ai_service.generate_script(
-            request.script_type,
+        scripts = await ai_service.generate_script_alternatives(
             request.task_description,
-            request.parameters
+            script_type=request.script_type,
+            parameters=request.parameters,
+            num_alternatives=request.num_alternatives
         )
-        return ScriptResponse(script=script)
+        return ScriptResponse(
+            script=scripts[0],
+            alternatives=scripts if request.num_alternatives > 1 else None
+        )
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/analyze-config", response_model=AnalysisResponse)
-def analyze_config(
+async def analyze_config(
     *,
     request: AnalysisRequest,
     current_user: User = Depends(deps.get_current_user),
@@ -63,16 +77,18 @@ def analyze_config(
     Analyze server configuration files and provide recommendations
     """
     try:
-        analysis = ai_service.analyze_configuration(
+        analysis = await ai_service.analyze_config(
             request.config_content,
             request.config_type
         )
         return AnalysisResponse(analysis=analysis)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/cpanel-solution", response_model=ScriptResponse)
-def get_cpanel_solution(
+async def get_cpanel_solution(
     *,
     request: ScriptRequest,
     current_user: User = Depends(deps.get_current_user),
@@ -82,10 +98,16 @@ def get_cpanel_solution(
     Generate cPanel/WHM solutions and commands
     """
     try:
-        solution = ai_service.generate_cpanel_solution(
+        solutions = await ai_service.generate_cpanel_alternatives(
             request.task_description,
-            request.parameters
+            request.parameters,
+            num_alternatives=request.num_alternatives
+        )
+        return ScriptResponse(
+            script=solutions[0],
+            alternatives=solutions if request.num_alternatives > 1 else None
         )
-        return ScriptResponse(script=solution)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
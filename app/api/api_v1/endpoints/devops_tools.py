@@ -2,15 +2,16 @@ from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.api import deps
+from app.core.deadline import DeadlineExceeded
 from app.schemas.user import User
-from app.services.ai_service import AIService
+from app.services.ai_service import get_ai_service
 from app.schemas.ai import ScriptRequest, ScriptResponse, AnalysisRequest, AnalysisResponse
 
 router = APIRouter()
-ai_service = AIService()
+ai_service = get_ai_service()
 
 @router.post("/generate-pipeline", response_model=ScriptResponse)
-def generate_pipeline(
+async def generate_pipeline(
     *,
     request: ScriptRequest,
     current_user: User = Depends(deps.get_current_user),
@@ -20,17 +21,23 @@ def generate_pipeline(
     Generate CI/CD pipeline configurations (GitHub Actions, GitLab CI, Jenkins)
     """
     try:
-        script = ai_service.generate_script(
+        scripts = await ai_service.generate_script_alternatives(
+            request.task_description,
             script_type="pipeline",
-            task_description=request.task_description,
-            parameters=request.parameters
+            parameters=request.parameters,
+            num_alternatives=request.num_alternatives
         )
-        return ScriptResponse(script=script)
+        return ScriptResponse(
+            script=scripts[0],
+            alternatives=scripts if request.num_alternatives > 1 else None
+        )
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/generate-dockerfile", response_model=ScriptResponse)
-def generate_dockerfile(
+async def generate_dockerfile(
     *,
     request: ScriptRequest,
     current_user: User = Depends(deps.get_current_user),
@@ -40,17 +47,23 @@ def generate_dockerfile(
     Generate Dockerfile and docker-compose configurations
     """
     try:
-        script = ai_service.generate_script(
+        scripts = await ai_service.generate_script_alternatives(
+            request.task_description,
             script_type="dockerfile",
-            task_description=request.task_description,
-            parameters=request.parameters
+            parameters=request.parameters,
+            num_alternatives=request.num_alternatives
+        )
+        return ScriptResponse(
+            script=scripts[0],
+            alternatives=scripts if request.num_alternatives > 1 else None
         )
-        return ScriptResponse(script=script)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/generate-kubernetes", response_model=ScriptResponse)
-def generate_kubernetes(
+async def generate_kubernetes(
     *,
     request: ScriptRequest,
     current_user: User = Depends(deps.get_current_user),
@@ -60,17 +73,23 @@ def generate_kubernetes(
     Generate Kubernetes manifests and configurations
     """
     try:
-        script = ai_service.generate_script(
+        scripts = await ai_service.generate_script_alternatives(
+            request.task_description,
             script_type="kubernetes",
-            task_description=request.task_description,
-            parameters=request.parameters
+            parameters=request.parameters,
+            num_alternatives=request.num_alternatives
         )
-        return ScriptResponse(script=script)
+        return ScriptResponse(
+            script=scripts[0],
+            alternatives=scripts if request.num_alternatives > 1 else None
+        )
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/analyze-infrastructure", response_model=AnalysisResponse)
-def analyze_infrastructure(
+async def analyze_infrastructure(
     *,
     request: AnalysisRequest,
     current_user: User = Depends(deps.get_current_user),
@@ -80,16 +99,18 @@ def analyze_infrastructure(
     Analyze infrastructure configurations and provide recommendations
     """
     try:
-        analysis = ai_service.analyze_configuration(
+        analysis = await ai_service.analyze_config(
             request.config_content,
             request.config_type
         )
         return AnalysisResponse(analysis=analysis)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/monitoring-setup", response_model=ScriptResponse)
-def generate_monitoring_config(
+async def generate_monitoring_config(
     *,
     request: ScriptRequest,
     current_user: User = Depends(deps.get_current_user),
@@ -99,11 +120,17 @@ def generate_monitoring_config(
     Generate monitoring and alerting configurations (Prometheus, Grafana, etc.)
     """
     try:
-        script = ai_service.generate_script(
+        scripts = await ai_service.generate_script_alternatives(
+            request.task_description,
             script_type="monitoring",
-            task_description=request.task_description,
-            parameters=request.parameters
+            parameters=request.parameters,
+            num_alternatives=request.num_alternatives
+        )
+        return ScriptResponse(
+            script=scripts[0],
+            alternatives=scripts if request.num_alternatives > 1 else None
         )
-        return ScriptResponse(script=script)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
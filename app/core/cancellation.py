@@ -0,0 +1,103 @@
+import asyncio
+import threading
+from contextvars import ContextVar
+from typing import Optional
+
+from app.core import metrics
+
+# Routes whose handlers only generate text, so abandoning them midway is safe
+CANCELLABLE_PATHS = ("/api/v1/assistant/", "/api/v1/devops/")
+# nginx's status for a request the client closed before the response was sent
+CLIENT_CLOSED_REQUEST = 499
+
+
+class CancellationToken:
+    """Thread-safe flag telling a running generation to stop at its next decode step"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+# Token of the generation being run in the current task, read by the backends
+cancel_token_var: ContextVar[Optional[CancellationToken]] = ContextVar("cancel_token", default=None)
+
+
+def current_cancel_token() -> Optional[CancellationToken]:
+    """Get the cancellation token of the generation being run, if any"""
+    return cancel_token_var.get()
+
+
+class DisconnectMiddleware:
+    """ASGI middleware cancelling generation handlers when the client goes away.
+
+    Once the handler has read the whole request body, the next message the
+    server can deliver is http.disconnect. A watcher waits for it and cancels
+    the handler task, which propagates down to the generation.
+    """
+
+    def __init__(self, app, paths=CANCELLABLE_PATHS):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        watcher: Optional[asyncio.Future] = None
+        body_read = asyncio.Event()
+        response_started = False
+
+        async def watched_receive():
+            # After the body, any later receive shares the watcher's disconnect message
+            if watcher is not None:
+                return await asyncio.shield(watcher)
+            message = await receive()
+            if message["type"] == "http.disconnect" or not message.get("more_body", False):
+                body_read.set()
+            return message
+
+        async def watched_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, watched_receive, watched_send))
+        body_wait = asyncio.ensure_future(body_read.wait())
+        try:
+            await asyncio.wait({handler, body_wait}, return_when=asyncio.FIRST_COMPLETED)
+            if not handler.done():
+                watcher = asyncio.ensure_future(self._wait_for_disconnect(receive))
+                await asyncio.wait({handler, watcher}, return_when=asyncio.FIRST_COMPLETED)
+                if not handler.done():
+                    handler.cancel()
+                    metrics.client_disconnects.inc()
+                    try:
+                        await handler
+                    except asyncio.CancelledError:
+                        pass
+                    if not response_started:
+                        # The client is gone; this only gives metrics and traces a status
+                        await send({"type": "http.response.start", "status": CLIENT_CLOSED_REQUEST, "headers": []})
+                        await send({"type": "http.response.body", "body": b""})
+                    return
+            await handler
+        finally:
+            for task in (handler, body_wait, watcher):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return message
\ No newline at end of file
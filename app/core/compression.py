@@ -0,0 +1,83 @@
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.config import settings
+from app.core.static import accepted_encodings, brotli
+
+# Response prefixes that get compressed; static files are precompressed at build time
+COMPRESSED_PATHS = ("/api/", "/metrics")
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+# Fast settings: these responses are compressed once per request, not once per build
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+def choose_encoding(request_headers: Headers):
+    """Pick br or gzip from Accept-Encoding, preferring the higher q value"""
+    accepted = accepted_encodings(request_headers)
+    candidates = [("br", accepted.get("br", 0))] if brotli is not None else []
+    candidates.append(("gzip", accepted.get("gzip", 0)))
+    encoding, q = max(candidates, key=lambda candidate: candidate[1])
+    return encoding if q > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing API responses of at least COMPRESSION_MIN_SIZE bytes.
+
+    Only single-message responses are compressed. Streamed responses pass
+    through untouched so each chunk still reaches the client as soon as it
+    is produced.
+    """
+
+    def __init__(self, app, minimum_size: int = None, paths=COMPRESSED_PATHS):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.minimum_size <= 0 or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            if (message.get("more_body", False)
+                    or len(body) < self.minimum_size
+                    or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
\ No newline at end of file
@@ -25,11 +25,73 @@ class Settings(BaseSettings):
     CORS_ORIGINS: List[str] = os.getenv("CORS_ORIGINS", "http://localhost:8000,http://127.0.0.1:8000,http://195.201.21.145:8000,http://195.201.21.145").split(",")
     
     # Rate Limiting
-    RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
+    RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", "10"))
+    RATE_LIMIT_STORE_URL: str = os.getenv("RATE_LIMIT_STORE_URL", "")
+    RATE_LIMIT_TRUST_PROXY: bool = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+    
+    # Inference Scheduling
+    INFERENCE_CONCURRENCY: int = int(os.getenv("INFERENCE_CONCURRENCY", "1"))
+    SCHEDULER_QUANTUM_TOKENS: int = int(os.getenv("SCHEDULER_QUANTUM_TOKENS", "256"))
+    # Larger or smaller shares of inference time per client address, e.g. "10.0.0.5=2,10.0.0.9=0.5"
+    SCHEDULER_CLIENT_WEIGHTS: str = os.getenv("SCHEDULER_CLIENT_WEIGHTS", "")
+    
+    # Tracing
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+    TRACE_BUFFER_SIZE: int = int(os.getenv("TRACE_BUFFER_SIZE", "100"))
     
     # AI Model
     AI_MODEL_NAME: str = os.getenv("AI_MODEL_NAME", "facebook/opt-350m")
     AI_MODEL_CACHE_DIR: str = os.getenv("AI_MODEL_CACHE_DIR", "./model_cache")
+    AI_SMALL_MODEL_NAME: str = os.getenv("AI_SMALL_MODEL_NAME", "")
+    SMALL_MODEL_CONCURRENCY: int = int(os.getenv("SMALL_MODEL_CONCURRENCY", "1"))
+    SMALL_MODEL_MAX_PROMPT_CHARS: int = int(os.getenv("SMALL_MODEL_MAX_PROMPT_CHARS", "2000"))
+    MODEL_MEMORY_BUDGET_MB: int = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+    MODEL_SWAP_DRAIN_TIMEOUT: float = float(os.getenv("MODEL_SWAP_DRAIN_TIMEOUT", "300"))
+    # Exchanges of conversation history sent with each prompt (0 sends none)
+    CONVERSATION_HISTORY_TURNS: int = int(os.getenv("CONVERSATION_HISTORY_TURNS", "5"))
+    
+    # Request deadlines; the X-Request-Timeout header overrides the per-endpoint default
+    REQUEST_DEADLINE_DEFAULT: float = float(os.getenv("REQUEST_DEADLINE_DEFAULT", "60"))
+    REQUEST_DEADLINE_MAX: float = float(os.getenv("REQUEST_DEADLINE_MAX", "300"))
+    DEADLINE_MIN_TOKENS: int = int(os.getenv("DEADLINE_MIN_TOKENS", "32"))
+    
+    # Most alternatives a command or script request may ask for in one batched generation
+    MAX_ALTERNATIVES: int = int(os.getenv("MAX_ALTERNATIVES", "5"))
+    
+    # Memory soft limit: generation requests are shed above it. MEMORY_SOFT_LIMIT_MB wins over the
+    # fraction of the headroom between the idle RSS and the container limit; both 0 disables shedding
+    MEMORY_SOFT_LIMIT_MB: int = int(os.getenv("MEMORY_SOFT_LIMIT_MB", "0"))
+    MEMORY_SOFT_LIMIT_FRACTION: float = float(os.getenv("MEMORY_SOFT_LIMIT_FRACTION", "0.85"))
+    MEMORY_CHECK_SECONDS: float = float(os.getenv("MEMORY_CHECK_SECONDS", "1"))
+    # Seconds between memory breakdown log lines (0 disables them)
+    MEMORY_LOG_INTERVAL: float = float(os.getenv("MEMORY_LOG_INTERVAL", "300"))
+    # Frames kept per tracemalloc allocation for leak diffs (0 leaves tracemalloc off; it slows allocation)
+    TRACEMALLOC_FRAMES: int = int(os.getenv("TRACEMALLOC_FRAMES", "0"))
+    
+    # Config analysis findings cache; an empty directory disables it
+    CONFIG_CACHE_DIR: str = os.getenv("CONFIG_CACHE_DIR", "./model_cache/config_analysis")
+    CONFIG_CACHE_MAX_ENTRIES: int = int(os.getenv("CONFIG_CACHE_MAX_ENTRIES", "20000"))
+    
+    # Inference Backend: "torch", "onnx" or "http"
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "torch")
+    ONNX_EXPORT_DIR: str = os.getenv("ONNX_EXPORT_DIR", "./model_cache/onnx")
+    ONNX_NUM_THREADS: int = int(os.getenv("ONNX_NUM_THREADS", "0"))
+    
+    # Inference Server (INFERENCE_BACKEND=http)
+    INFERENCE_SERVER_URL: str = os.getenv("INFERENCE_SERVER_URL", "http://127.0.0.1:8080")
+    INFERENCE_SERVER_MODEL: str = os.getenv("INFERENCE_SERVER_MODEL", "")
+    INFERENCE_SERVER_TIMEOUT: float = float(os.getenv("INFERENCE_SERVER_TIMEOUT", "60"))
+    INFERENCE_SERVER_CONNECT_TIMEOUT: float = float(os.getenv("INFERENCE_SERVER_CONNECT_TIMEOUT", "2"))
+    INFERENCE_SERVER_MAX_CONNECTIONS: int = int(os.getenv("INFERENCE_SERVER_MAX_CONNECTIONS", "16"))
+    INFERENCE_SERVER_RETRIES: int = int(os.getenv("INFERENCE_SERVER_RETRIES", "2"))
+    INFERENCE_SERVER_RETRY_BACKOFF: float = float(os.getenv("INFERENCE_SERVER_RETRY_BACKOFF", "0.2"))
+    CIRCUIT_BREAKER_FAILURES: int = int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5"))
+    CIRCUIT_BREAKER_RESET_SECONDS: float = float(os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30"))
+    INFERENCE_FALLBACK_BACKEND: str = os.getenv("INFERENCE_FALLBACK_BACKEND", "torch")
+    
+    # Response compression; 0 disables it
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
     
     # Server
     HOST: str = os.getenv("HOST", "0.0.0.0")
@@ -0,0 +1,124 @@
+import math
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.cancellation import CANCELLABLE_PATHS
+
+# Seconds the client will wait for the response, e.g. "X-Request-Timeout: 20"
+DEADLINE_HEADER = b"x-request-timeout"
+# Set on responses whose generated text was cut short to meet the deadline
+TRUNCATED_HEADER = b"x-response-truncated"
+# Generation stops this long before the client's timeout, leaving time to send the response
+DEADLINE_SAFETY_SECONDS = 0.5
+
+# Timeouts for endpoints whose answers take longer or shorter than REQUEST_DEADLINE_DEFAULT
+ENDPOINT_DEADLINES: Dict[str, float] = {
+    "/api/v1/assistant/command": 30.0,
+    "/api/v1/assistant/generate-command": 30.0,
+    "/api/v1/assistant/script": 120.0,
+    "/api/v1/assistant/generate-script": 120.0,
+    "/api/v1/assistant/analyze": 120.0,
+    "/api/v1/assistant/analyze-config": 120.0,
+    "/api/v1/devops/analyze-infrastructure": 120.0,
+}
+
+
+class DeadlineExceeded(Exception):
+    """A request cannot be answered before its deadline, so it was not run"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(math.ceil(self.retry_after), 1))}
+
+
+class Deadline:
+    """When a request must be answered by, and whether its answer was cut short to make it.
+
+    A generation gets its own copy with a token budget estimated from the
+    model's measured speed; marking the copy truncated also marks the request.
+    """
+
+    def __init__(self, expires_at: float, max_tokens: Optional[int] = None, parent: Optional["Deadline"] = None):
+        self.expires_at = expires_at
+        self.max_tokens = max_tokens
+        self.parent = parent
+        self.truncated = False
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def with_token_budget(self, max_tokens: Optional[int]) -> "Deadline":
+        return Deadline(self.expires_at, max_tokens, self)
+
+    def mark_truncated(self):
+        self.truncated = True
+        if self.parent is not None:
+            self.parent.mark_truncated()
+
+
+# Deadline of the request or generation being run, read by the scheduler and backends
+deadline_var: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Get the deadline of the request being served, if any"""
+    return deadline_var.get()
+
+
+def request_timeout(path: str, header: Optional[bytes]) -> float:
+    """Seconds a request may take: the client's header, else the endpoint default, capped by the maximum"""
+    timeout = ENDPOINT_DEADLINES.get(path.rstrip("/"), settings.REQUEST_DEADLINE_DEFAULT)
+    if header is not None:
+        try:
+            requested = float(header)
+        except ValueError:
+            requested = None
+        if requested is not None and math.isfinite(requested) and requested > 0:
+            timeout = requested
+    return min(timeout, settings.REQUEST_DEADLINE_MAX)
+
+
+class DeadlineMiddleware:
+    """ASGI middleware giving generation requests a deadline.
+
+    The deadline comes from the X-Request-Timeout header or the endpoint's
+    default. Responses whose text was cut short to meet it carry an
+    X-Response-Truncated header.
+    """
+
+    def __init__(self, app, paths=CANCELLABLE_PATHS):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        header = dict(scope["headers"]).get(DEADLINE_HEADER)
+        deadline = Deadline.after(request_timeout(scope["path"], header) - DEADLINE_SAFETY_SECONDS)
+
+        async def deadline_send(message):
+            if message["type"] == "http.response.start" and deadline.truncated:
+                message = {**message, "headers": list(message.get("headers", [])) + [(TRUNCATED_HEADER, b"deadline")]}
+            await send(message)
+
+        token = deadline_var.set(deadline)
+        try:
+            await self.app(scope, receive, deadline_send)
+        finally:
+            deadline_var.reset(token)
\ No newline at end of file
@@ -0,0 +1,310 @@
+import asyncio
+import ctypes
+import gc
+import json
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core import metrics
+from app.core.cancellation import CANCELLABLE_PATHS
+
+logger = logging.getLogger(__name__)
+
+# Shedding stops once RSS falls below this fraction of the soft limit, so it does not flap
+RESUME_FRACTION = 0.9
+# Seconds clients are told to wait before retrying a shed request
+SHED_RETRY_AFTER = 5
+# cgroup v1 reports "no limit" as a number near 2**63
+UNLIMITED_BYTES = 2**60
+CGROUP_LIMIT_FILES = ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes")
+
+
+def process_rss_bytes() -> int:
+    """Resident set size of this process; falls back to the peak where /proc is missing"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    """Highest resident set size this process has reached"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def cgroup_limit_bytes() -> Optional[int]:
+    """The container memory limit the kernel enforces, if any"""
+    for path in CGROUP_LIMIT_FILES:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value == "max":
+            return None
+        try:
+            limit = int(value)
+        except ValueError:
+            continue
+        return limit if limit < UNLIMITED_BYTES else None
+    return None
+
+
+def soft_limit_bytes(baseline: int = 0) -> int:
+    """MEMORY_SOFT_LIMIT_MB, else the idle baseline plus MEMORY_SOFT_LIMIT_FRACTION of the headroom
+    between it and the container limit; 0 disables"""
+    if settings.MEMORY_SOFT_LIMIT_MB:
+        return settings.MEMORY_SOFT_LIMIT_MB * 2**20
+    limit = cgroup_limit_bytes()
+    if limit is None or settings.MEMORY_SOFT_LIMIT_FRACTION <= 0 or baseline >= limit:
+        return 0
+    return baseline + int((limit - baseline) * settings.MEMORY_SOFT_LIMIT_FRACTION)
+
+
+def approximate_size(obj: Any, seen: Optional[set] = None) -> int:
+    """Bytes held by an object and everything it references, counting shared objects once.
+
+    Follows containers and instance attributes; buffers owned by C
+    extensions (tensors, arrays) only count if they report nbytes.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int):
+        return size + nbytes
+    if isinstance(obj, dict):
+        return size + sum(approximate_size(k, seen) + approximate_size(v, seen) for k, v in list(obj.items()))
+    if isinstance(obj, (list, tuple, set, frozenset)) or type(obj).__name__ == "deque":
+        return size + sum(approximate_size(item, seen) for item in list(obj))
+    if hasattr(obj, "__dict__"):
+        size += approximate_size(vars(obj), seen)
+    return size
+
+
+def collection_usage(obj: Any) -> Dict[str, int]:
+    """Entry count and approximate bytes of an in-process history or cache"""
+    return {"items": len(obj), "bytes": approximate_size(obj)}
+
+
+class SnapshotDiff:
+    """Top allocation growth between successive tracemalloc snapshots.
+
+    Each diff is taken against the snapshot of the previous call, so
+    repeated calls show what grew in between. Needs TRACEMALLOC_FRAMES > 0.
+    """
+
+    FILTERS = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    )
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(self.FILTERS)
+
+    def diff(self, top: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """Locations whose allocations grew most since the last call; None if tracing is off"""
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = self._snapshot()
+        baseline, self._baseline = self._baseline, snapshot
+        if baseline is None:
+            stats = snapshot.statistics("lineno")
+            return [self._entry(stat, stat.size, stat.count) for stat in stats[:top]]
+        # Shrinking locations are not what leaks
+        stats = [stat for stat in snapshot.compare_to(baseline, "lineno") if stat.size_diff > 0]
+        return [self._entry(stat, stat.size_diff, stat.count_diff) for stat in stats[:top]]
+
+    @staticmethod
+    def _entry(stat, size_diff: int, count_diff: int) -> Dict[str, Any]:
+        frame = stat.traceback[0]
+        return {
+            "location": f"{frame.filename}:{frame.lineno}",
+            "size": stat.size,
+            "size_diff": size_diff,
+            "count_diff": count_diff,
+        }
+
+
+def release_free_memory():
+    """Collect garbage and hand freed heap pages back to the OS"""
+    gc.collect()
+    try:
+        # glibc keeps freed arenas mapped; without this RSS barely drops after a large generation
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _mb(n: int) -> str:
+    return f"{n / 2**20:.1f}MB"
+
+
+class MemoryGuard:
+    """Samples process RSS and sheds generation requests above the soft limit.
+
+    Crossing the limit also runs the relief callback, which drops what the
+    service can rebuild, and frees unused heap. Shedding stops once RSS is
+    back under RESUME_FRACTION of the limit, or under the limit itself after
+    SHED_RETRY_AFTER seconds, so an idle worker resting just below the limit
+    is not shut out for good. The default limit is placed in the headroom
+    above the idle RSS measured once the models are loaded, since a fraction
+    of the container limit alone can sit below what the models already take.
+    """
+
+    def __init__(self, soft_limit: int):
+        self.soft_limit = soft_limit
+        self.shedding = False
+        self.shedding_since = 0.0
+        self.rss = 0
+        self.relieve: Optional[Callable[[], None]] = None
+        # The periodic log line and the admin endpoint each diff against their own previous snapshot
+        self.log_diff = SnapshotDiff()
+        self.report_diff = SnapshotDiff()
+
+    def calibrate(self) -> int:
+        """Set the soft limit from the idle RSS; an explicit limit below it is disabled"""
+        self.rss = process_rss_bytes()
+        self.soft_limit = soft_limit_bytes(self.rss)
+        if self.soft_limit and self.rss >= self.soft_limit:
+            # Only MEMORY_SOFT_LIMIT_MB can land here; a limit under the idle worker would shed every request
+            logger.error("RSS %s with models loaded is already over MEMORY_SOFT_LIMIT_MB (%s); load shedding "
+                         "is disabled. Raise it or unset it to use MEMORY_SOFT_LIMIT_FRACTION of the headroom",
+                         _mb(self.rss), _mb(self.soft_limit))
+            self.soft_limit = 0
+        elif self.soft_limit:
+            logger.info("Memory soft limit %s over an idle RSS of %s", _mb(self.soft_limit), _mb(self.rss))
+        return self.rss
+
+    async def check(self) -> int:
+        self.rss = process_rss_bytes()
+        if not self.soft_limit:
+            return self.rss
+        if not self.shedding and self.rss >= self.soft_limit:
+            self.shedding = True
+            self.shedding_since = time.monotonic()
+            metrics.memory_soft_limit_exceeded.inc()
+            logger.warning("RSS %s is over the %s soft limit; shedding generation requests",
+                           _mb(self.rss), _mb(self.soft_limit))
+            # A full collection and malloc_trim over a large heap would stall the event loop
+            self.rss = await run_in_threadpool(self._free)
+        settled = time.monotonic() - self.shedding_since >= SHED_RETRY_AFTER
+        if self.shedding and (self.rss < self.soft_limit * RESUME_FRACTION
+                              or (settled and self.rss < self.soft_limit)):
+            self.shedding = False
+            logger.info("RSS %s is back under the soft limit; accepting generation requests", _mb(self.rss))
+        return self.rss
+
+    def _free(self) -> int:
+        if self.relieve is not None:
+            self.relieve()
+        release_free_memory()
+        return process_rss_bytes()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "peak_rss_bytes": peak_rss_bytes(),
+            "limit_bytes": cgroup_limit_bytes(),
+            "soft_limit_bytes": self.soft_limit,
+            "shedding": self.shedding,
+        }
+
+    def log_line(self, usage: Dict[str, Any], top: int = 5) -> str:
+        """One line breaking down where the process memory goes"""
+        parts = [f"rss={_mb(usage['rss_bytes'])}"]
+        limit = cgroup_limit_bytes()
+        if limit is not None:
+            parts.append(f"limit={_mb(limit)}")
+        if self.soft_limit:
+            parts.append(f"soft_limit={_mb(self.soft_limit)}")
+        if self.shedding:
+            parts.append("shedding")
+        parts.append(f"models={_mb(usage['models_bytes'])}")
+        for name, collection in usage["collections"].items():
+            parts.append(f"{name}={collection['items']}/{_mb(collection['bytes'])}")
+        parts.append(f"peak_generation={_mb(usage['generations']['max_peak_bytes'])}")
+        parts.append(f"unaccounted={_mb(usage['unaccounted_bytes'])}")
+        growth = self.log_diff.diff(top)
+        if growth:
+            parts.append("growth: " + ", ".join(f"{entry['location']} {entry['size_diff'] / 1024:+.0f}KB"
+                                                 for entry in growth))
+        return "Memory " + " ".join(parts)
+
+    async def run(self, report: Callable[[], Dict[str, Any]]):
+        """Check RSS every MEMORY_CHECK_SECONDS and log a breakdown every MEMORY_LOG_INTERVAL.
+
+        Started once the models are loaded, so the first reading is the idle baseline.
+        """
+        self.calibrate()
+        since_log = 0.0
+        while True:
+            await asyncio.sleep(settings.MEMORY_CHECK_SECONDS)
+            await self.check()
+            since_log += settings.MEMORY_CHECK_SECONDS
+            if settings.MEMORY_LOG_INTERVAL and since_log >= settings.MEMORY_LOG_INTERVAL:
+                since_log = 0.0
+                try:
+                    # Snapshots and size walks take a while on a large heap, so they run off the event loop
+                    logger.info(await run_in_threadpool(lambda: self.log_line(report())))
+                except Exception:
+                    logger.exception("Memory report failed")
+
+
+if settings.TRACEMALLOC_FRAMES and not tracemalloc.is_tracing():
+    # Started at import so allocations made while loading models are attributed too
+    tracemalloc.start(settings.TRACEMALLOC_FRAMES)
+
+memory_guard = MemoryGuard(soft_limit_bytes())
+metrics.process_resident_bytes.set_function(process_rss_bytes)
+
+
+class MemoryLimitMiddleware:
+    """ASGI middleware refusing generation requests while RSS is over the soft limit.
+
+    Refused requests get 503 with Retry-After, so load balancers and clients
+    back off before the kernel's OOM killer takes the whole worker down.
+    """
+
+    def __init__(self, app, guard: MemoryGuard = memory_guard, paths=CANCELLABLE_PATHS):
+        self.app = app
+        self.guard = guard
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.guard.shedding or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        metrics.memory_shed_requests.inc()
+        body = json.dumps({"detail": "Server is low on memory, retry shortly"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(SHED_RETRY_AFTER).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
\ No newline at end of file
@@ -0,0 +1,362 @@
+import math
+from bisect import bisect_left
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from cache hits up to long script generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class _Sharded:
+    """Per-thread value shards; writers never contend, readers sum the shards"""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+
+    def shard(self) -> List[float]:
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = self._local.values = [0.0] * self._size
+            # list.append is atomic, so registering a new shard needs no lock
+            self._shards.append(shard)
+        return shard
+
+    def totals(self) -> List[float]:
+        totals = [0.0] * self._size
+        for shard in list(self._shards):
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+
+class _CounterChild(_Sharded):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1.0):
+        self.shard()[0] += amount
+
+    def value(self) -> float:
+        return self.totals()[0]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._fn: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, fn: Callable[[], float]):
+        """Compute the value at scrape time instead of storing it"""
+        self._fn = fn
+
+    def value(self) -> float:
+        return float(self._fn()) if self._fn is not None else self._value
+
+
+class _HistogramChild(_Sharded):
+    def __init__(self, buckets: Sequence[float]):
+        # One slot per bucket, then +Inf, then the running sum
+        super().__init__(len(buckets) + 2)
+        self._buckets = buckets
+
+    def observe(self, value: float):
+        shard = self.shard()
+        shard[bisect_left(self._buckets, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        """Return (cumulative bucket counts, sum, count)"""
+        totals = self.totals()
+        cumulative, running = [], 0.0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-1], running
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            # setdefault keeps the first child if two threads race here
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_str(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{self._label_str(key)} {_format(child.value())}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def set_function(self, fn: Callable[[], float]):
+        self.labels().set_function(fn)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_child(self, key, child) -> List[str]:
+        cumulative, total, count = child.snapshot()
+        lines = []
+        for bound, value in zip(self.buckets + (math.inf,), cumulative):
+            le = 'le="%s"' % ("+Inf" if bound == math.inf else _format(bound))
+            lines.append(f"{self.name}_bucket{self._label_str(key, le)} {_format(value)}")
+        lines.append(f"{self.name}_sum{self._label_str(key)} {_format(total)}")
+        lines.append(f"{self.name}_count{self._label_str(key)} {_format(count)}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """Render all metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in list(REGISTRY):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# HTTP
+http_request_duration = Histogram(
+    "sumiya_http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route", "status")
+)
+
+# Inference
+inference_ttft = Histogram(
+    "sumiya_inference_time_to_first_token_seconds", "Time from request start to the first generated token",
+    ("method",)
+)
+inference_duration = Histogram(
+    "sumiya_inference_duration_seconds", "Total generation time", ("method",)
+)
+inference_tokens_per_second = Histogram(
+    "sumiya_inference_tokens_per_second", "Decode throughput per generation", ("method",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+inference_prompt_tokens = Counter(
+    "sumiya_inference_prompt_tokens_total", "Prompt tokens processed", ("method",)
+)
+inference_completion_tokens = Counter(
+    "sumiya_inference_completion_tokens_total", "Completion tokens generated", ("method",)
+)
+inference_stop_reason = Counter(
+    "sumiya_inference_stop_reason_total", "Why generation ended: stop_string, eos or budget",
+    ("method", "reason")
+)
+inference_tokens_saved = Counter(
+    "sumiya_inference_tokens_saved_total",
+    "Decode steps avoided compared with running to the old max_length=1000 budget", ("method",)
+)
+inference_batch_size = Histogram(
+    "sumiya_inference_batch_size", "Sequences generated per model.generate call",
+    buckets=(1, 2, 4, 8, 16, 32)
+)
+inference_queue_depth = Gauge(
+    "sumiya_inference_queue_depth", "Requests waiting for an inference slot", ("tier",)
+)
+inference_running = Gauge(
+    "sumiya_inference_running", "Requests currently holding an inference slot", ("tier",)
+)
+
+inference_server_requests = Counter(
+    "sumiya_inference_server_requests_total",
+    "Inference server calls by outcome: success, retry, failure or fallback", ("outcome",)
+)
+inference_circuit_state = Gauge(
+    "sumiya_inference_circuit_state", "Inference server circuit breaker: 0 closed, 1 open, 2 half-open"
+)
+
+inference_cancelled = Counter(
+    "sumiya_inference_cancelled_total",
+    "Generations abandoned because the client disconnected, by phase: queued or generating",
+    ("method", "phase")
+)
+inference_tokens_reclaimed = Counter(
+    "sumiya_inference_tokens_reclaimed_total",
+    "Decode steps not run because the client disconnected before generation finished", ("method",)
+)
+inference_deadline_rejected = Counter(
+    "sumiya_inference_deadline_rejected_total",
+    "Requests refused because they could not finish before their deadline, by phase: admission or queued",
+    ("method", "phase")
+)
+inference_deadline_truncated = Counter(
+    "sumiya_inference_deadline_truncated_total",
+    "Generations cut short to answer before the request deadline", ("method",)
+)
+inference_alternatives_distinct = Histogram(
+    "sumiya_inference_alternatives_distinct",
+    "Distinct answers left after deduplicating the alternatives of one batched generation", ("method",),
+    buckets=(1, 2, 3, 4, 5, 8)
+)
+inference_kv_cache_bytes = Histogram(
+    "sumiya_inference_kv_cache_bytes", "Estimated key/value cache size at the end of each generation", ("method",),
+    buckets=tuple(2**n for n in range(20, 34))
+)
+inference_memory_peak_bytes = Histogram(
+    "sumiya_inference_memory_peak_bytes",
+    "Peak memory growth during each generation: CUDA allocations, else process RSS", ("method",),
+    buckets=tuple(2**n for n in range(20, 34))
+)
+client_disconnects = Counter(
+    "sumiya_client_disconnects_total", "Requests whose client disconnected before the response"
+)
+single_flight_calls = Counter(
+    "sumiya_single_flight_calls_total",
+    "Calls that started work (leader) or joined identical in-flight work (follower)", ("flight", "role")
+)
+
+# Models
+process_resident_bytes = Gauge(
+    "sumiya_process_resident_bytes", "Resident set size of this worker process"
+)
+memory_soft_limit_exceeded = Counter(
+    "sumiya_memory_soft_limit_exceeded_total", "Times RSS crossed MEMORY_SOFT_LIMIT and load shedding started"
+)
+memory_shed_requests = Counter(
+    "sumiya_memory_shed_requests_total", "Generation requests refused while RSS was over the soft limit"
+)
+model_load_seconds = Gauge(
+    "sumiya_model_load_seconds", "Time taken to load a model", ("model",)
+)
+model_resident_bytes = Gauge(
+    "sumiya_model_resident_bytes", "Parameter and buffer bytes of a loaded model", ("model",)
+)
+model_evictions = Counter(
+    "sumiya_model_evictions_total", "Models unloaded to stay within the memory budget", ("model",)
+)
+model_swap_seconds = Gauge(
+    "sumiya_model_swap_seconds", "Duration of each phase of the last hot model swap", ("phase",)
+)
+model_swaps = Counter(
+    "sumiya_model_swaps_total", "Hot model swaps by result", ("result",)
+)
+model_routes = Counter(
+    "sumiya_model_routes_total", "Requests routed to each model tier", ("tier", "method")
+)
+
+# Caches
+cache_requests = Counter(
+    "sumiya_cache_requests_total", "Cache lookups by result", ("cache", "result")
+)
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup as a hit or miss"""
+    cache_requests.labels(cache, "hit" if hit else "miss").inc()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template"""
+
+    def __init__(self, app, routes: Sequence = ()):
+        self.app = app
+        self.routes = routes
+        self._paths: Optional[Dict[object, str]] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.labels(
+                scope["method"], self._route(scope), status_code[0]
+            ).observe(time.perf_counter() - start)
+
+    def _route(self, scope) -> str:
+        """Map a request to its route template so label cardinality stays bounded"""
+        if self._paths is None:
+            self._paths = {
+                route.endpoint: route.path
+                for route in self.routes if hasattr(route, "endpoint")
+            }
+        path = self._paths.get(scope.get("endpoint"))
+        if path:
+            return path
+        if scope["path"].startswith("/static/"):
+            return "/static"
+        return "unmatched"
\ No newline at end of file
@@ -0,0 +1,163 @@
+import json
+import math
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional, only needed for a shared store
+    aioredis = None
+
+# Identity of the client that issued the current request, used for fair scheduling
+client_key_var: ContextVar[str] = ContextVar("client_key", default="anonymous")
+
+# Paths that are never rate limited
+EXEMPT_PATHS = ("/api/health",)
+
+
+def current_client_key() -> str:
+    """Get the client key of the request being handled"""
+    return client_key_var.get()
+
+
+class MemoryBucketStore:
+    """In-process token bucket store, one bucket per client key"""
+
+    def __init__(self, rate: float, capacity: float, max_keys: int = 10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def consume(self, key: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """Take tokens from a bucket, returning (allowed, retry_after_seconds)"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+
+        if tokens >= cost:
+            self._buckets[key] = (tokens - cost, now)
+            allowed, retry_after = True, 0.0
+        else:
+            self._buckets[key] = (tokens, now)
+            allowed, retry_after = False, (cost - tokens) / self.rate
+
+        if len(self._buckets) > self.max_keys:
+            self._prune(now)
+        return allowed, retry_after
+
+    def _prune(self, now: float):
+        """Drop buckets that have refilled completely; they carry no state"""
+        full_after = self.capacity / self.rate
+        self._buckets = {
+            key: (tokens, updated)
+            for key, (tokens, updated) in self._buckets.items()
+            if now - updated < full_after
+        }
+
+
+class RedisBucketStore:
+    """Token bucket store shared between worker processes through Redis"""
+
+    # Refill and consume atomically on the Redis side
+    SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, url: str, rate: float, capacity: float, prefix: str = "sumiya:ratelimit:"):
+        if aioredis is None:
+            raise RuntimeError("RATE_LIMIT_STORE_URL is set but the redis package is not installed")
+        self.rate = rate
+        self.capacity = capacity
+        self.prefix = prefix
+        self._client = aioredis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    async def consume(self, key: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """Take tokens from a bucket, returning (allowed, retry_after_seconds)"""
+        allowed, tokens = await self._script(
+            keys=[self.prefix + key],
+            args=[self.rate, self.capacity, time.time(), cost]
+        )
+        if allowed:
+            return True, 0.0
+        return False, (cost - float(tokens)) / self.rate
+
+
+def create_bucket_store():
+    """Build the bucket store configured in settings"""
+    rate = settings.RATE_LIMIT_PER_MINUTE / 60.0
+    capacity = float(max(settings.RATE_LIMIT_BURST, 1))
+    if settings.RATE_LIMIT_STORE_URL:
+        return RedisBucketStore(settings.RATE_LIMIT_STORE_URL, rate, capacity)
+    return MemoryBucketStore(rate, capacity)
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing RATE_LIMIT_PER_MINUTE per client on API routes"""
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or create_bucket_store()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        key = self._client_key(scope)
+        token = client_key_var.set(key)
+        try:
+            path = scope["path"]
+            if settings.RATE_LIMIT_PER_MINUTE > 0 and path.startswith("/api/") and path not in EXEMPT_PATHS:
+                allowed, retry_after = await self.store.consume(key)
+                if not allowed:
+                    await self._reject(send, retry_after)
+                    return
+            await self.app(scope, receive, send)
+        finally:
+            client_key_var.reset(token)
+
+    def _client_key(self, scope) -> str:
+        """Identify the caller; all sessions share one passkey, so key on address"""
+        headers = dict(scope.get("headers") or [])
+        host: Optional[str] = None
+        if settings.RATE_LIMIT_TRUST_PROXY:
+            real_ip = headers.get(b"x-real-ip")
+            if real_ip:
+                host = real_ip.decode("latin-1").strip()
+        if not host and scope.get("client"):
+            host = scope["client"][0]
+        return f"ip:{host or 'unknown'}"
+
+    async def _reject(self, send, retry_after: float):
+        """Send a 429 response"""
+        body = json.dumps({"detail": "Rate limit exceeded"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
\ No newline at end of file
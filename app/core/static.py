@@ -0,0 +1,163 @@
+"""Fingerprinted, precompressed static assets.
+
+`python -m app.core.static` copies every file under app/static into
+app/static/dist with a content hash in its name, writes .gz and .br siblings
+next to each compressible file and records the mapping in manifest.json.
+Templates link assets through `asset_url`, so a changed file gets a new URL
+and the old one can be cached forever.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+from functools import lru_cache
+from mimetypes import guess_type
+from pathlib import Path
+from typing import Dict
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.staticfiles import NotModifiedResponse
+from starlette.responses import FileResponse, Response
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always built
+    brotli = None
+
+STATIC_DIR = Path("app/static")
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+STATIC_URL = "/static"
+
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".json", ".map", ".svg", ".txt", ".html", ".xml", ".ico"}
+# Files this small gain nothing from compression
+MIN_COMPRESS_SIZE = 256
+# Preferred first when the client accepts several
+ENCODING_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def fingerprint(data: bytes) -> str:
+    """Short content hash used in the built file name"""
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def build_assets(static_dir: Path = STATIC_DIR) -> Dict[str, str]:
+    """Build dist/ with hashed, precompressed copies of every asset and return the manifest"""
+    static_dir = Path(static_dir)
+    dist = static_dir / DIST_DIR
+    if dist.exists():
+        shutil.rmtree(dist)
+    dist.mkdir(parents=True)
+
+    manifest = {}
+    for source in sorted(static_dir.rglob("*")):
+        if not source.is_file() or dist in source.parents:
+            continue
+        data = source.read_bytes()
+        logical = source.relative_to(static_dir).as_posix()
+        target = dist / source.relative_to(static_dir).with_name(
+            f"{source.stem}.{fingerprint(data)}{source.suffix}"
+        )
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        manifest[logical] = target.relative_to(static_dir).as_posix()
+
+        if source.suffix not in COMPRESSIBLE_SUFFIXES or len(data) < MIN_COMPRESS_SIZE:
+            continue
+        # mtime=0 keeps the .gz bytes reproducible between builds
+        Path(f"{target}.gz").write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            Path(f"{target}.br").write_bytes(brotli.compress(data, quality=11))
+
+    (dist / MANIFEST).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+
+@lru_cache(maxsize=None)
+def load_manifest(static_dir: Path = STATIC_DIR) -> Dict[str, str]:
+    try:
+        return json.loads((Path(static_dir) / DIST_DIR / MANIFEST).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url(path: str) -> str:
+    """URL of a static asset, fingerprinted when the build step has run"""
+    return f"{STATIC_URL}/{load_manifest().get(path, path)}"
+
+
+def accepted_encodings(request_headers: Headers) -> Dict[str, float]:
+    """Parse Accept-Encoding into {coding: q}, dropping codings with q=0"""
+    encodings = {}
+    for item in request_headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+        if q > 0:
+            encodings[coding.strip().lower()] = q
+    return encodings
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves .br/.gz siblings and caches fingerprinted files forever"""
+
+    def __init__(self, *, directory, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.dist_dir = os.path.realpath(os.path.join(directory, DIST_DIR)) + os.sep
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        media_type = guess_type(full_path)[0] or "text/plain"
+
+        variants = [(encoding, full_path + suffix) for encoding, suffix in ENCODING_SUFFIXES
+                    if os.path.isfile(full_path + suffix)]
+        accepted = accepted_encodings(request_headers)
+        encoding, path = next(((e, p) for e, p in variants if e in accepted), (None, full_path))
+        response = FileResponse(
+            path,
+            status_code=status_code,
+            stat_result=os.stat(path) if encoding else stat_result,
+            method=scope["method"],
+            media_type=media_type,
+        )
+        if encoding:
+            response.headers["content-encoding"] = encoding
+        if variants:
+            response.headers.add_vary_header("Accept-Encoding")
+        response.headers["cache-control"] = IMMUTABLE if full_path.startswith(self.dist_dir) else REVALIDATE
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def main(argv=None) -> int:
+    static_dir = Path(argv[0]) if argv else STATIC_DIR
+    manifest = build_assets(static_dir)
+    print(f"Built {len(manifest)} assets into {static_dir / DIST_DIR}"
+          f"{'' if brotli else ' (install brotli for .br variants)'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
\ No newline at end of file
@@ -0,0 +1,213 @@
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.auth import verify_passkey
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:  # pyinstrument is optional, cProfile is always available
+    PyinstrumentProfiler = None
+
+# Request header selecting a profiler for a single request
+PROFILE_HEADER = b"x-sumiya-profile"
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+class Span:
+    """A timed phase of a request"""
+
+    __slots__ = ("name", "start", "end", "thread_id", "args")
+
+    def __init__(self, name: str, start: float, end: float, args: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.thread_id = threading.get_ident()
+        self.args = args
+
+
+class Trace:
+    """All spans recorded while handling one request"""
+
+    def __init__(self, name: str, sampled: bool = False, profiler: Optional[str] = None):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.sampled = sampled
+        self.profiler = profiler
+        self.profile: Optional[str] = None
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+
+    def add(self, name: str, start: float, end: float, **args):
+        # list.append is atomic, spans may arrive from threadpool workers
+        self.spans.append(Span(name, start, end, args or None))
+
+    def server_timing(self) -> str:
+        """Summarize spans as a Server-Timing header value, summing repeated phases"""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + (span.end - span.start)
+        end = self.end if self.end is not None else time.perf_counter()
+        totals["total"] = end - self.start
+        return ", ".join(f"{name};dur={duration * 1000:.1f}" for name, duration in totals.items())
+
+    def trace_events(self, pid: int = 1) -> List[Dict[str, Any]]:
+        """Convert to Chrome trace-event format (complete events, microseconds)"""
+        end = self.end if self.end is not None else time.perf_counter()
+        events = [{
+            "name": self.name, "ph": "X", "pid": pid, "tid": 0,
+            "ts": self.start * 1e6, "dur": (end - self.start) * 1e6,
+            "args": {"trace_id": self.id},
+        }]
+        for span in self.spans:
+            events.append({
+                "name": span.name, "ph": "X", "pid": pid, "tid": span.thread_id,
+                "ts": span.start * 1e6, "dur": (span.end - span.start) * 1e6,
+                "args": span.args or {},
+            })
+        return events
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+# Most recent sampled or profiled traces
+_trace_buffer: Deque[Trace] = deque(maxlen=settings.TRACE_BUFFER_SIZE)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **args):
+    """Time a block as a phase of the current request; a no-op outside requests"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter(), **args)
+
+
+def record(name: str, start: float, end: float, **args):
+    """Record a phase whose boundaries were measured elsewhere"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, start, end, **args)
+
+
+def call_profiled(fn: Callable, *args, **kwargs):
+    """Call fn, profiling it if the current request asked for a profile.
+
+    Profilers only see the thread they run in, so this wraps the work that is
+    handed to the threadpool rather than the request handler.
+    """
+    trace = _current_trace.get()
+    if trace is None or trace.profiler is None:
+        return fn(*args, **kwargs)
+
+    if trace.profiler == "pyinstrument" and PyinstrumentProfiler is not None:
+        profiler = PyinstrumentProfiler()
+        profiler.start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.stop()
+            trace.profile = profiler.output_text(unicode=True)
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(50)
+        trace.profile = out.getvalue()
+
+
+def recent_traces() -> List[Trace]:
+    return list(_trace_buffer)
+
+
+def find_trace(trace_id: str) -> Optional[Trace]:
+    for trace in list(_trace_buffer):
+        if trace.id == trace_id:
+            return trace
+    return None
+
+
+def chrome_trace(traces: List[Trace]) -> Dict[str, Any]:
+    """Bundle traces into a document loadable by chrome://tracing or Perfetto"""
+    events = []
+    for pid, trace in enumerate(traces, start=1):
+        events.extend(trace.trace_events(pid))
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class TracingMiddleware:
+    """ASGI middleware that traces API requests and emits Server-Timing headers"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(
+            f"{scope['method']} {scope['path']}",
+            sampled=random.random() < settings.TRACE_SAMPLE_RATE,
+            profiler=self._requested_profiler(scope)
+        )
+        token = _current_trace.set(trace)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                trace.end = time.perf_counter()
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                headers.append((b"x-trace-id", trace.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            if trace.end is None:
+                trace.end = time.perf_counter()
+            if trace.sampled or trace.profiler:
+                _trace_buffer.append(trace)
+
+    def _requested_profiler(self, scope) -> Optional[str]:
+        """Honor the profile header only for authenticated callers"""
+        profiler = None
+        cookie = None
+        for name, value in scope.get("headers") or []:
+            if name == PROFILE_HEADER:
+                profiler = value.decode("latin-1").strip().lower()
+            elif name == b"cookie":
+                cookie = value.decode("latin-1")
+        if profiler not in PROFILERS or not cookie:
+            return None
+        for part in cookie.split(";"):
+            key, _, value = part.strip().partition("=")
+            if key == "passkey" and verify_passkey(value):
+                return profiler
+        return None
\ No newline at end of file
@@ -1,15 +1,27 @@
 from fastapi import FastAPI, Request, Response, HTTPException, status, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from pathlib import Path
+import asyncio
 import os
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
 from app.core.auth import authenticate_passkey
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.cancellation import DisconnectMiddleware
+from app.core.deadline import DeadlineExceeded, DeadlineMiddleware
+from app.core.memory import MemoryLimitMiddleware, memory_guard
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.compression import CompressionMiddleware
+from app.core.static import PrecompressedStaticFiles, asset_url
+from app.core import tracing
+from app.core.tracing import TracingMiddleware
 from app.api.deps import get_current_user
-from app.services.ai_service import AIService
+from app.api.api_v1.endpoints import ai_assistant, devops_tools
+from app.services.ai_service import get_ai_service
+from app.services.model_pool import DEFAULT_TIER, source_name
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -26,14 +38,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Static files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# Abandon generation when the client disconnects
+app.add_middleware(DisconnectMiddleware)
+
+# Give generation requests a deadline; added after DisconnectMiddleware so its handler task inherits it
+app.add_middleware(DeadlineMiddleware)
+
+# Per-client token bucket rate limiting
+app.add_middleware(RateLimitMiddleware)
+
+# Refuse generation requests while RSS is over the memory soft limit
+app.add_middleware(MemoryLimitMiddleware)
+
+# Per-request phase timings and sampled traces
+app.add_middleware(TracingMiddleware)
+
+# Compress large API responses when nothing in front of the app does
+app.add_middleware(CompressionMiddleware)
+
+# Request latency metrics; added last so it also times rejected requests
+app.add_middleware(MetricsMiddleware, routes=app.routes)
+
+# Static files; fingerprinted copies under /static/dist are built by `python -m app.core.static`
+app.mount("/static", PrecompressedStaticFiles(directory="app/static"), name="static")
 
 # Templates
 templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["asset_url"] = asset_url
 
 # Initialize AI service
-ai_service = AIService()
+ai_service = get_ai_service()
+
+# Memory checks, load shedding and periodic breakdown log lines
+memory_guard.relieve = ai_service.relieve_memory
+
+@app.on_event("startup")
+async def start_memory_guard():
+    asyncio.get_event_loop().create_task(memory_guard.run(ai_service.memory_usage))
+
+# API routers
+app.include_router(ai_assistant.router, prefix=f"{settings.API_V1_STR}/assistant", tags=["ai-assistant"])
+app.include_router(devops_tools.router, prefix=f"{settings.API_V1_STR}/devops", tags=["devops-tools"])
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
@@ -87,16 +132,84 @@ async def health_check():
     return {
         "status": "healthy",
         "version": settings.VERSION,
-        "model": settings.AI_MODEL_NAME
+        "model": source_name(ai_service.tiers[DEFAULT_TIER].model_name)
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/debug/traces")
+async def download_traces(current_user: dict = Depends(get_current_user)):
+    """Download sampled request traces as Chrome trace-event JSON."""
+    return JSONResponse(
+        tracing.chrome_trace(tracing.recent_traces()),
+        headers={"Content-Disposition": "attachment; filename=sumiya-traces.json"}
+    )
+
+@app.get("/api/debug/traces/{trace_id}/profile")
+async def download_profile(trace_id: str, current_user: dict = Depends(get_current_user)):
+    """Get the profiler output captured for a single request."""
+    trace = tracing.find_trace(trace_id)
+    if trace is None or trace.profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No profile for this trace"
+        )
+    return PlainTextResponse(trace.profile)
+
+@app.get("/api/admin/models")
+async def model_status(current_user: dict = Depends(get_current_user)):
+    """Show which model serves each tier, resident models and recent swaps."""
+    return {
+        "tiers": {name: tier.model_name for name, tier in ai_service.tiers.items()},
+        "loaded": ai_service.models.stats(),
+        "swaps": ai_service.swapper.statuses()
     }
 
+@app.get("/api/admin/memory")
+async def memory_status(top: int = 10, current_user: dict = Depends(get_current_user)):
+    """Break down process memory; allocation growth covers the time since the previous call."""
+    def report():
+        return {
+            **memory_guard.status(),
+            **ai_service.memory_usage(),
+            "tracemalloc_growth": memory_guard.report_diff.diff(top)
+        }
+    return await run_in_threadpool(report)
+
+@app.post("/api/admin/models/swap", status_code=status.HTTP_202_ACCEPTED)
+async def swap_model(
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Load a new model version in the background and switch a tier to it."""
+    data = await request.json()
+    model = data.get("model")
+    
+    if not model:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Model is required"
+        )
+    
+    try:
+        swap = ai_service.swapper.start(data.get("tier", DEFAULT_TIER), model)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return swap.as_dict()
+
 @app.post("/api/v1/assistant/chat")
 async def chat(
     request: Request,
     current_user: dict = Depends(get_current_user)
 ):
     """Chat endpoint for the AI assistant."""
-    data = await request.json()
+    with tracing.span("parse_body"):
+        data = await request.json()
     message = data.get("message")
     
     if not message:
@@ -106,21 +219,38 @@ async def chat(
         )
     
     try:
-        response = ai_service.get_completion(message)
+        response = await ai_service.generate_response(message)
         return {"response": response}
+    except DeadlineExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers=e.headers
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
+def _num_alternatives(data: dict) -> int:
+    """Read num_alternatives from a request body, defaulting to a single answer"""
+    value = data.get("num_alternatives", 1)
+    if not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= settings.MAX_ALTERNATIVES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"num_alternatives must be an integer from 1 to {settings.MAX_ALTERNATIVES}"
+        )
+    return value
+
 @app.post("/api/v1/assistant/command")
 async def generate_command(
     request: Request,
     current_user: dict = Depends(get_current_user)
 ):
     """Generate Linux command based on description."""
-    data = await request.json()
+    with tracing.span("parse_body"):
+        data = await request.json()
     description = data.get("description")
     
     if not description:
@@ -128,10 +258,20 @@ async def generate_command(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Description is required"
         )
+    num_alternatives = _num_alternatives(data)
     
     try:
-        command = ai_service.generate_command(description)
+        if num_alternatives > 1:
+            commands = await ai_service.generate_command_alternatives(description, num_alternatives)
+            return {"command": commands[0], "alternatives": commands}
+        command = await ai_service.generate_linux_command(description)
         return {"command": command}
+    except DeadlineExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers=e.headers
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -144,7 +284,8 @@ async def generate_script(
     current_user: dict = Depends(get_current_user)
 ):
     """Generate shell script based on requirements."""
-    data = await request.json()
+    with tracing.span("parse_body"):
+        data = await request.json()
     requirements = data.get("requirements")
     
     if not requirements:
@@ -152,10 +293,20 @@ async def generate_script(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Requirements are required"
         )
+    num_alternatives = _num_alternatives(data)
     
     try:
-        script = ai_service.generate_script(requirements)
+        if num_alternatives > 1:
+            scripts = await ai_service.generate_script_alternatives(requirements, num_alternatives=num_alternatives)
+            return {"script": scripts[0], "alternatives": scripts}
+        script = await ai_service.generate_script(requirements)
         return {"script": script}
+    except DeadlineExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers=e.headers
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -168,7 +319,8 @@ async def analyze_config(
     current_user: dict = Depends(get_current_user)
 ):
     """Analyze system configuration file."""
-    data = await request.json()
+    with tracing.span("parse_body"):
+        data = await request.json()
     config = data.get("config")
     config_type = data.get("type", "general")
     
@@ -179,8 +331,14 @@ async def analyze_config(
         )
     
     try:
-        analysis = ai_service.analyze_config(config, config_type)
+        analysis = await ai_service.analyze_config(config, config_type)
         return {"analysis": analysis}
+    except DeadlineExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers=e.headers
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,19 +1,25 @@
-from typing import Dict, Any, Optional
-from pydantic import BaseModel
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel, Field
+from app.core.config import settings
 
 class CommandRequest(BaseModel):
     task_description: str
+    num_alternatives: int = Field(1, ge=1, le=settings.MAX_ALTERNATIVES)
 
 class CommandResponse(BaseModel):
     command: str
+    # Distinct candidates best first, the first being command; only when more than one was asked for
+    alternatives: Optional[List[str]] = None
 
 class ScriptRequest(BaseModel):
     script_type: str
     task_description: str
     parameters: Optional[Dict[str, Any]] = None
+    num_alternatives: int = Field(1, ge=1, le=settings.MAX_ALTERNATIVES)
 
 class ScriptResponse(BaseModel):
     script: str
+    alternatives: Optional[List[str]] = None
 
 class AnalysisRequest(BaseModel):
     config_content: str
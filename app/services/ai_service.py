@@ -1,31 +1,62 @@
-from typing import Dict, Any, Optional
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+from typing import Dict, Any, List, Optional
+import asyncio
+import logging
+from starlette.concurrency import run_in_threadpool
 import re
 import json
+import time
+from collections import deque
 from app.core.config import settings
+from app.core import metrics, tracing
+from app.core.memory import collection_usage, process_rss_bytes
+from app.core.rate_limit import current_client_key
+from app.core.cancellation import CancellationToken, cancel_token_var, current_cancel_token
+from app.core.deadline import Deadline, DeadlineExceeded, current_deadline, deadline_var
+from app.services.model_pool import DEFAULT_TIER, LoadedModel, ModelPool, ModelRouter, ModelTier, build_tiers
+from app.services.model_swap import ModelSwapper
+from app.services.single_flight import SingleFlight, normalize_prompt
+from app.services.intent_classifier import get_intent_classifier
+from app.services.config_analysis import ConfigAnalysisCache, ConfigBlock, split_config
+from app.services.alternatives import (
+    ALTERNATIVES_TEMPERATURE, ALTERNATIVES_TOP_P, is_shell_script, rank_alternatives
+)
+from app.services.generation import (
+    CHARS_PER_TOKEN, LEGACY_MAX_LENGTH, TRUNCATION_NOTICE, ThroughputEstimate, get_profile
+)
+from app.services.backends.base import GenerationRequest, GenerationResult, create_backend
+
+logger = logging.getLogger(__name__)
+
+# Below this calibrated confidence a request is answered as general chat
+INTENT_MIN_CONFIDENCE = 0.5
+# Prompt tokens are processed in one batched forward pass, far cheaper than decode steps
+PREFILL_COST_RATIO = 0.1
+# Stands in for the findings of a config block there was no time left to analyze
+BLOCK_SKIPPED_NOTICE = "[Not analyzed: the request deadline was reached.]"
 
 class AIService:
     def __init__(self):
-        self.model = None
-        self.tokenizer = None
+        self.tiers = build_tiers()
+        self.router = ModelRouter(self.tiers, settings.SMALL_MODEL_MAX_PROMPT_CHARS)
+        self.backend = create_backend(settings.INFERENCE_BACKEND)
+        self.models = ModelPool(self.backend.load, settings.MODEL_MEMORY_BUDGET_MB * 2**20)
+        self.backend.models = self.models
+        self.swapper = ModelSwapper(self.models, self.tiers, self.backend)
+        # A leader refused for its own deadline says nothing about a follower's
+        self.in_flight = SingleFlight("generation", unshared_errors=(DeadlineExceeded,))
+        self.intent_classifier = get_intent_classifier()
+        self.config_cache = ConfigAnalysisCache(settings.CONFIG_CACHE_DIR, settings.CONFIG_CACHE_MAX_ENTRIES)
+        # Measured speed of each model, keyed like the model pool
+        self.throughput: Dict[str, ThroughputEstimate] = {}
+        # Memory used by recent generations, for the memory report
+        self.generation_memory: deque = deque(maxlen=50)
         self.conversation_history = []
         self.context = {}
         self._initialize_model()
 
     def _initialize_model(self):
-        """Initialize the model and tokenizer with enhanced capabilities"""
-        if self.model is None or self.tokenizer is None:
-            model_name = settings.AI_MODEL_NAME
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                torch_dtype=torch.float16,
-                device_map="auto"
-            )
-            # Enable model features for better conversation
-            self.model.config.pad_token_id = self.tokenizer.eos_token_id
-            self.model.config.use_cache = True
+        """Load the default model up front; smaller tiers load on first use"""
+        self.models.pin_tier(self.tiers[DEFAULT_TIER])
 
     def _preprocess_input(self, text: str) -> str:
         """Clean and normalize input text"""
@@ -60,11 +91,62 @@ class AIService:
             text = re.sub(rf'\b{typo}\b', correction, text, flags=re.IGNORECASE)
         return text
 
-    def _get_completion(self, prompt: str, max_length: int = 1000) -> str:
+    def _get_completion(
+        self,
+        prompt: str,
+        method: str = "chat",
+        max_new_tokens: Optional[int] = None,
+        tier: Optional[ModelTier] = None,
+        history: bool = True,
+        num_return_sequences: int = 1
+    ) -> GenerationResult:
         """Generate a response with context awareness"""
+        with self.models.acquire_tier(tier or self.tiers[DEFAULT_TIER]) as loaded:
+            return self._generate(loaded, prompt, method, max_new_tokens, history, num_return_sequences)
+
+    async def _agenerate(
+        self,
+        prompt: str,
+        method: str = "chat",
+        max_new_tokens: Optional[int] = None,
+        tier: Optional[ModelTier] = None,
+        history: bool = True,
+        num_return_sequences: int = 1
+    ) -> GenerationResult:
+        """Generate on the event loop through an async backend"""
+        start = time.perf_counter()
+        request = self._build_request(prompt, method, max_new_tokens, history, num_return_sequences)
+        with self.models.acquire_tier(tier or self.tiers[DEFAULT_TIER]) as loaded:
+            result = await self.backend.agenerate(loaded.model, loaded.tokenizer, request)
+        self._observe_throughput(loaded.name, result)
+        return self._finish(prompt, method, start, request, result, history)
+
+    def _generate(self, loaded: LoadedModel, prompt: str, method: str, max_new_tokens: Optional[int],
+                  history: bool = True, num_return_sequences: int = 1) -> GenerationResult:
+        """Run generate on a borrowed model"""
+        start = time.perf_counter()
+        request = self._build_request(prompt, method, max_new_tokens, history, num_return_sequences)
+        result = self.backend.generate(loaded.model, loaded.tokenizer, request)
+        self._observe_throughput(loaded.name, result)
+        return self._finish(prompt, method, start, request, result, history)
+
+    def _observe_throughput(self, model_name: str, result: GenerationResult):
+        """Update a model's speed estimate from one generate call"""
+        if result.first_token_at is None or result.finish_reasons[0] == "cancelled":
+            return
+        self.throughput.setdefault(model_name, ThroughputEstimate()).observe(
+            result.prompt_tokens,
+            result.first_token_at - result.generate_start,
+            result.completion_tokens // result.batch_size - 1,
+            result.generate_end - result.first_token_at
+        )
+
+    def _build_request(self, prompt: str, method: str, max_new_tokens: Optional[int],
+                       history: bool = True, num_return_sequences: int = 1) -> GenerationRequest:
+        """Wrap the user prompt with recent conversation history, unless the answer must not depend on it"""
         # Add conversation history to context
         context = "\n".join([f"User: {msg['user']}\nAssistant: {msg['assistant']}" 
-                           for msg in self.conversation_history[-5:]])  # Keep last 5 exchanges
+                           for msg in self._history(history)])
         
         full_prompt = f"""Previous conversation:
 {context}
@@ -80,59 +162,297 @@ Please provide a helpful, conversational response that:
 
 Response:"""
 
-        inputs = self.tokenizer(full_prompt, return_tensors="pt").to(self.model.device)
-        outputs = self.model.generate(
-            **inputs,
-            max_length=max_length,
-            num_return_sequences=1,
-            temperature=0.7,
-            top_p=0.9,
-            do_sample=True,
-            pad_token_id=self.tokenizer.eos_token_id
-        )
-        response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # Extract just the response part
-        response = response.split("Response:")[-1].strip()
+        if num_return_sequences > 1:
+            # Alternatives are sampled warmer so they differ, all from one batched generate call
+            return GenerationRequest(full_prompt, get_profile(method), max_new_tokens,
+                                     temperature=ALTERNATIVES_TEMPERATURE, top_p=ALTERNATIVES_TOP_P, do_sample=True,
+                                     num_return_sequences=num_return_sequences, cancel=current_cancel_token(),
+                                     deadline=current_deadline())
+        return GenerationRequest(full_prompt, get_profile(method), max_new_tokens, cancel=current_cancel_token(),
+                                 deadline=current_deadline())
+
+    def _history(self, history: bool = True) -> list:
+        """The exchanges a prompt is given as context: the last few, or none"""
+        turns = settings.CONVERSATION_HISTORY_TURNS
+        return self.conversation_history[-turns:] if history and turns > 0 else []
+
+    def _finish(self, prompt: str, method: str, start: float, request: GenerationRequest,
+                result: GenerationResult, history: bool = True) -> GenerationResult:
+        """Record metrics for a finished generation and remember the exchange.
+
+        Alternatives are remembered by the caller once it has picked the best.
+        """
+        self._record_generation(method, start, result)
+        if result.finish_reasons[0] == "cancelled":
+            # Nobody will read a cut-off answer, so it never enters the history
+            generated = result.completion_tokens // result.batch_size
+            metrics.inference_cancelled.labels(method, "generating").inc()
+            metrics.inference_tokens_reclaimed.labels(method).inc(
+                max(request.max_new_tokens - generated, 0) * result.batch_size
+            )
+            return result
+        self._record_stop(method, result)
+        for i, reason in enumerate(result.finish_reasons):
+            if reason == "deadline":
+                metrics.inference_deadline_truncated.labels(method).inc()
+                request.deadline.mark_truncated()
+                result.texts[i] += TRUNCATION_NOTICE
+        if not history or result.batch_size > 1:
+            return result
         
         # Update conversation history
         self.conversation_history.append({
             "user": prompt,
-            "assistant": response
+            "assistant": result.text
         })
         
-        return response
+        return result
+
+    def _record_generation(self, method: str, start: float, result: GenerationResult):
+        """Export latency and token counts for one generate call"""
+        elapsed = time.perf_counter() - start
+        metrics.inference_duration.labels(method).observe(elapsed)
+        metrics.inference_prompt_tokens.labels(method).inc(result.prompt_tokens)
+        metrics.inference_completion_tokens.labels(method).inc(result.completion_tokens)
+        metrics.inference_batch_size.observe(result.batch_size)
+        if result.kv_cache_bytes is not None:
+            metrics.inference_kv_cache_bytes.labels(method).observe(result.kv_cache_bytes)
+        if result.peak_memory_bytes is not None:
+            metrics.inference_memory_peak_bytes.labels(method).observe(result.peak_memory_bytes)
+            self.generation_memory.append({
+                "method": method,
+                "batch_size": result.batch_size,
+                "tokens": result.prompt_tokens + result.completion_tokens // result.batch_size,
+                "kv_cache_bytes": result.kv_cache_bytes,
+                "peak_bytes": result.peak_memory_bytes,
+            })
+        if result.first_token_at is not None:
+            metrics.inference_ttft.labels(method).observe(result.first_token_at - start)
+            decode_time = result.generate_end - result.first_token_at
+            decoded = result.completion_tokens - result.batch_size
+            if decode_time > 0 and decoded > 0:
+                metrics.inference_tokens_per_second.labels(method).observe(decoded / decode_time)
+
+    def _record_stop(self, method: str, result: GenerationResult):
+        """Count why generation ended and how many decode steps that saved"""
+        metrics.inference_stop_reason.labels(method, result.finish_reasons[0]).inc()
+        # Compared with the old fixed max_length=1000 generate call
+        generated = result.completion_tokens // result.batch_size
+        legacy_budget = max(LEGACY_MAX_LENGTH - result.prompt_tokens, 0)
+        metrics.inference_tokens_saved.labels(method).inc(max(legacy_budget - generated, 0))
+
+    def _prompt_tokens(self, prompt: str, history: bool = True) -> int:
+        """Estimate the prompt length in tokens, including the conversation it is sent with"""
+        history_chars = sum(len(msg["user"]) + len(msg["assistant"])
+                            for msg in self._history(history))
+        return (len(prompt) + history_chars) // CHARS_PER_TOKEN
+
+    def _estimate_cost(self, prompt: str, max_new_tokens: int, history: bool = True,
+                       num_return_sequences: int = 1) -> float:
+        """Estimate the token cost of a completion for scheduling"""
+        # The prompt is prefilled once per sequence, but in the same batched forward pass
+        return self._prompt_tokens(prompt, history) * PREFILL_COST_RATIO + max_new_tokens * num_return_sequences
+
+    def _admit(self, tier: ModelTier, method: str, deadline: Deadline, prompt_tokens: int) -> float:
+        """Refuse a request that cannot finish before its deadline; returns how long it may wait for a slot"""
+        remaining = deadline.remaining()
+        estimate = self.throughput.get(tier.model_name)
+        if estimate is None or not estimate.ready:
+            # Nothing measured for this model yet; only refuse requests already out of time
+            wait, needed = 0.0, 0.0
+        else:
+            wait = tier.scheduler.backlog() / (estimate.decode_tokens_per_second * tier.scheduler.concurrency)
+            needed = estimate.seconds_for(prompt_tokens, settings.DEADLINE_MIN_TOKENS)
+        if remaining <= 0 or remaining < wait + needed:
+            metrics.inference_deadline_rejected.labels(method, "admission").inc()
+            raise DeadlineExceeded(
+                f"Request cannot finish before its deadline: about {wait + needed:.1f}s needed, {remaining:.1f}s left",
+                retry_after=wait
+            )
+        return remaining - needed
+
+    def _generation_deadline(self, tier: ModelTier, method: str, deadline: Deadline, prompt_tokens: int) -> Deadline:
+        """The deadline for one generation, with as many new tokens as fit before it"""
+        estimate = self.throughput.get(tier.model_name)
+        if estimate is None or not estimate.ready:
+            return deadline.with_token_budget(None)
+        tokens = estimate.tokens_within(deadline.remaining(), prompt_tokens)
+        if tokens < settings.DEADLINE_MIN_TOKENS:
+            metrics.inference_deadline_rejected.labels(method, "queued").inc()
+            raise DeadlineExceeded("Too little time left before the request deadline to generate an answer")
+        return deadline.with_token_budget(tokens)
+
+    async def _complete(self, prompt: str, method: str = "chat", max_new_tokens: Optional[int] = None,
+                        history: bool = True) -> str:
+        """Run a completion, sharing it with identical requests already in flight.
+
+        With history=False the prompt is sent without the conversation so far
+        and the exchange is not added to it.
+        """
+        tier = self.router.select(method, prompt)
+        result = await self._share(
+            method,
+            self._flight_key(tier, method, prompt, max_new_tokens, history),
+            lambda: self._run_completion(tier, prompt, method, max_new_tokens, history)
+        )
+        if "deadline" in result.finish_reasons:
+            self._mark_truncated()
+        return result.text
+
+    async def _share(self, method: str, key: tuple, fn):
+        """Run fn once for all identical requests in flight, each waiting no longer than its own deadline"""
+        deadline = current_deadline()
+        try:
+            return await self.in_flight.do(key, fn, deadline.remaining() if deadline is not None else None)
+        except asyncio.TimeoutError:
+            if deadline is None:
+                raise
+            metrics.inference_deadline_rejected.labels(method, "queued").inc()
+            raise DeadlineExceeded("Request deadline passed while an identical request was still generating")
+
+    @staticmethod
+    def _mark_truncated():
+        """Flag this request's answer as cut short; the generation only flags the request that led it"""
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.mark_truncated()
+
+    def _flight_key(self, tier: ModelTier, method: str, prompt: str, max_new_tokens: Optional[int],
+                    history: bool, num_return_sequences: int = 1) -> tuple:
+        """What identical in-flight requests share"""
+        # The history length pins the conversation context the answer was generated in
+        return (tier.name, method, normalize_prompt(prompt), max_new_tokens,
+                len(self.conversation_history) if history else None, num_return_sequences)
+
+    async def _complete_alternatives(self, prompt: str, method: str, num_alternatives: int,
+                                     shell: bool = False) -> List[str]:
+        """Sample up to num_alternatives answers in one batched generation; returns the distinct ones, best first.
+
+        `shell` marks answers that are shell commands or scripts, whose code is syntax-checked when ranking.
+        """
+        if num_alternatives <= 1:
+            return [await self._complete(prompt, method=method)]
+        tier = self.router.select(method, prompt)
+        ranked = await self._share(
+            method,
+            self._flight_key(tier, method, prompt, None, True, num_alternatives),
+            lambda: self._run_alternatives(tier, prompt, method, num_alternatives, shell)
+        )
+        if any(text.endswith(TRUNCATION_NOTICE) for text in ranked):
+            self._mark_truncated()
+        return ranked
+
+    async def _run_alternatives(self, tier: ModelTier, prompt: str, method: str, num_alternatives: int,
+                                shell: bool) -> List[str]:
+        """Generate the alternatives in one slot, then rank them and remember the best"""
+        result = await self._run_completion(tier, prompt, method, None, True, num_alternatives)
+        if result.finish_reasons[0] == "cancelled":
+            return result.texts
+        # The syntax check starts a shell per candidate, so it stays off the event loop
+        with tracing.span("rank_alternatives", candidates=result.batch_size):
+            ranked = await run_in_threadpool(rank_alternatives, result.texts, result.logprobs, shell)
+        ranked = ranked or [result.text]
+        metrics.inference_alternatives_distinct.labels(method).observe(len(ranked))
+        self.conversation_history.append({
+            "user": prompt,
+            "assistant": ranked[0]
+        })
+        return ranked
+
+    async def _run_completion(self, tier: ModelTier, prompt: str, method: str, max_new_tokens: Optional[int],
+                              history: bool = True, num_return_sequences: int = 1) -> GenerationResult:
+        """Run a completion once the scheduler grants a slot, off the event loop unless the backend is async"""
+        budget = max_new_tokens or get_profile(method).max_new_tokens
+        cost = self._estimate_cost(prompt, budget, history, num_return_sequences)
+        deadline = current_deadline()
+        prompt_tokens = self._prompt_tokens(prompt, history)
+        max_wait = self._admit(tier, method, deadline, prompt_tokens) if deadline is not None else None
+        # This task runs in its own context copy, so the token and deadline stay with this generation
+        token = CancellationToken()
+        cancel_token_var.set(token)
+        queued_at = time.perf_counter()
+        started = False
+        try:
+            async with tier.scheduler.slot(current_client_key(), cost, max_wait):
+                started = True
+                tracing.record("queue", queued_at, time.perf_counter(), tier=tier.name)
+                if deadline is not None:
+                    deadline_var.set(self._generation_deadline(tier, method, deadline, prompt_tokens))
+                if self.backend.is_async:
+                    return await self._agenerate(prompt, method, max_new_tokens, tier, history,
+                                                 num_return_sequences)
+                return await run_in_threadpool(
+                    tracing.call_profiled, self._get_completion, prompt, method, max_new_tokens, tier,
+                    history, num_return_sequences
+                )
+        except asyncio.TimeoutError:
+            if started:
+                raise
+            metrics.inference_deadline_rejected.labels(method, "queued").inc()
+            raise DeadlineExceeded("No inference slot became free before the request deadline")
+        except asyncio.CancelledError:
+            # The worker thread cannot be interrupted; the token stops it at its next decode step
+            token.cancel()
+            if not started:
+                metrics.inference_cancelled.labels(method, "queued").inc()
+                metrics.inference_tokens_reclaimed.labels(method).inc(budget * num_return_sequences)
+            elif self.backend.is_async:
+                metrics.inference_cancelled.labels(method, "generating").inc()
+            raise
+
+    def memory_usage(self) -> Dict[str, Any]:
+        """Break down the memory this service holds: models, recent generations and in-process state"""
+        rss = process_rss_bytes()
+        models = self.models.stats()
+        models_bytes = sum(model["bytes"] for model in models)
+        recent = list(self.generation_memory)
+        collections = {
+            "conversation_history": collection_usage(self.conversation_history),
+            "in_flight": collection_usage(self.in_flight),
+            "throughput": collection_usage(self.throughput),
+            "traces": collection_usage(tracing.recent_traces()),
+            "swap_history": collection_usage(self.swapper.history),
+            "intent_classifier": {
+                "items": len(self.intent_classifier.labels),
+                "bytes": self.intent_classifier.weights.nbytes + self.intent_classifier.bias.nbytes
+            },
+        }
+        return {
+            "rss_bytes": rss,
+            "models": models,
+            "models_bytes": models_bytes,
+            "generations": {
+                "recent": recent,
+                "max_kv_cache_bytes": max((g["kv_cache_bytes"] or 0 for g in recent), default=0),
+                "max_peak_bytes": max((g["peak_bytes"] for g in recent), default=0),
+            },
+            "collections": collections,
+            # Interpreter, libraries, allocator slack and request buffers; models on a GPU are not in RSS
+            "unaccounted_bytes": max(rss - models_bytes - sum(c["bytes"] for c in collections.values()), 0),
+        }
+
+    def relieve_memory(self):
+        """Drop state that is not needed to answer requests, when memory runs low"""
+        # Exchanges older than the ones sent with prompts are only kept until memory runs low
+        dropped = len(self.conversation_history) - max(settings.CONVERSATION_HISTORY_TURNS, 0)
+        if dropped > 0:
+            del self.conversation_history[:dropped]
+            logger.info("Dropped %d old conversation history entries", dropped)
 
     def _understand_intent(self, text: str) -> Dict[str, Any]:
         """Analyze user input to understand intent and context"""
+        intent_type, confidence = self.intent_classifier.classify_one(text)
+        if confidence < INTENT_MIN_CONFIDENCE:
+            # Unsure requests get the general prompt rather than a specialized, longer one
+            intent_type = "general"
         text = text.lower()
         intent = {
-            "type": "general",
-            "confidence": 0.0,
+            "type": intent_type,
+            "confidence": confidence,
             "entities": [],
             "context": {}
         }
         
-        # Detect command generation intent
-        if any(word in text for word in ["command", "run", "execute", "how to", "show me"]):
-            intent["type"] = "command_generation"
-            intent["confidence"] = 0.8
-        
-        # Detect script creation intent
-        elif any(word in text for word in ["script", "create", "write", "make", "generate"]):
-            intent["type"] = "script_creation"
-            intent["confidence"] = 0.8
-        
-        # Detect configuration analysis intent
-        elif any(word in text for word in ["config", "analyze", "check", "verify", "test"]):
-            intent["type"] = "config_analysis"
-            intent["confidence"] = 0.8
-        
-        # Detect cPanel solution intent
-        elif any(word in text for word in ["cpanel", "whm", "hosting", "website", "domain"]):
-            intent["type"] = "cpanel_solution"
-            intent["confidence"] = 0.8
-        
         # Extract entities (e.g., service names, commands, parameters)
         entities = re.findall(r'\b(nginx|apache|mysql|postgresql|docker|kubernetes|aws|azure|gcp)\b', text)
         intent["entities"] = list(set(entities))
@@ -142,10 +462,12 @@ Response:"""
     async def generate_response(self, user_input: str) -> str:
         """Generate a human-like response to user input"""
         # Preprocess input
-        cleaned_input = self._preprocess_input(user_input)
+        with tracing.span("preprocess"):
+            cleaned_input = self._preprocess_input(user_input)
         
         # Understand user intent
-        intent = self._understand_intent(cleaned_input)
+        with tracing.span("intent"):
+            intent = self._understand_intent(cleaned_input)
         
         # Generate appropriate response based on intent
         if intent["type"] == "command_generation":
@@ -157,17 +479,28 @@ Response:"""
         elif intent["type"] == "cpanel_solution":
             response = await self.generate_cpanel_solution(cleaned_input)
         else:
-            response = self._get_completion(cleaned_input)
+            response = await self._complete(cleaned_input)
         
         # Add follow-up suggestions based on context
-        if intent["confidence"] > 0.7:
+        if intent["type"] != "general" and intent["confidence"] > 0.7:
             response += "\n\nWould you like me to explain any part of this in more detail?"
         
         return response
 
     async def generate_linux_command(self, requirements: str) -> str:
         """Generate Linux commands with natural language understanding"""
-        prompt = f"""Based on the following requirements, generate a Linux command or series of commands.
+        response = await self._complete(self._command_prompt(requirements), method="generate_linux_command")
+        return response
+
+    async def generate_command_alternatives(self, requirements: str, num_alternatives: int) -> List[str]:
+        """Generate up to num_alternatives distinct commands, best first"""
+        return await self._complete_alternatives(
+            self._command_prompt(requirements), "generate_linux_command", num_alternatives, shell=True
+        )
+
+    @staticmethod
+    def _command_prompt(requirements: str) -> str:
+        return f"""Based on the following requirements, generate a Linux command or series of commands.
 Consider the user's intent and provide a clear explanation.
 
 Requirements: {requirements}
@@ -179,16 +512,38 @@ Please provide:
 4. Expected output
 
 Command:"""
-        
-        response = self._get_completion(prompt)
-        return response
 
-    async def generate_script(self, requirements: str) -> str:
+    async def generate_script(
+        self,
+        requirements: str,
+        script_type: str = "shell",
+        parameters: Optional[Dict[str, Any]] = None
+    ) -> str:
         """Generate scripts with natural language understanding"""
-        prompt = f"""Create a script based on the following requirements.
+        response = await self._complete(self._script_prompt(requirements, script_type, parameters),
+                                        method="generate_script")
+        return response
+
+    async def generate_script_alternatives(
+        self,
+        requirements: str,
+        script_type: str = "shell",
+        parameters: Optional[Dict[str, Any]] = None,
+        num_alternatives: int = 1
+    ) -> List[str]:
+        """Generate up to num_alternatives distinct scripts, best first"""
+        return await self._complete_alternatives(
+            self._script_prompt(requirements, script_type, parameters), "generate_script", num_alternatives,
+            shell=is_shell_script(script_type)
+        )
+
+    @staticmethod
+    def _script_prompt(requirements: str, script_type: str, parameters: Optional[Dict[str, Any]]) -> str:
+        details = f"\nParameters: {json.dumps(parameters)}" if parameters else ""
+        return f"""Create a {script_type} script based on the following requirements.
 Make it robust, well-documented, and user-friendly.
 
-Requirements: {requirements}
+Requirements: {requirements}{details}
 
 Please provide:
 1. The complete script with comments
@@ -197,13 +552,18 @@ Please provide:
 4. Example usage
 
 Script:"""
-        
-        response = self._get_completion(prompt)
-        return response
 
-    async def analyze_config(self, config_text: str) -> str:
-        """Analyze configuration files with natural language understanding"""
-        prompt = f"""Analyze the following configuration and provide insights.
+    async def analyze_config(self, config_text: str, config_type: str = "general") -> str:
+        """Analyze configuration files with natural language understanding.
+
+        Configs with several structural blocks are analyzed block by block, and
+        the findings of blocks unchanged since an earlier submission are reused.
+        """
+        blocks = split_config(config_text)
+        if len(blocks) > 1:
+            return await self._analyze_config_blocks(config_text, config_type, blocks)
+
+        prompt = f"""Analyze the following {config_type} configuration and provide insights.
 Focus on security, performance, and best practices.
 
 Configuration:
@@ -217,15 +577,93 @@ Please provide:
 
 Analysis:"""
         
-        response = self._get_completion(prompt)
+        response = await self._complete(prompt, method="analyze_config")
+        return response
+
+    async def _analyze_config_blocks(self, config_text: str, config_type: str, blocks: List[ConfigBlock]) -> str:
+        """Analyze each block of a config, generating only for blocks without cached findings"""
+        # analyze_config_block is never routed to the small tier
+        model = self.tiers[DEFAULT_TIER].model_name
+        keys = [self.config_cache.key(block, config_type, model) for block in blocks]
+        with tracing.span("config_cache", blocks=len(blocks)):
+            findings = await run_in_threadpool(lambda: [self.config_cache.get(key) for key in keys])
+        for cached in findings:
+            metrics.record_cache("config_analysis", cached is not None)
+
+        async def analyze(block: ConfigBlock, key: str) -> Optional[str]:
+            try:
+                result = await self._complete(self._block_prompt(block, config_type),
+                                              method="analyze_config_block", history=False)
+            except DeadlineExceeded:
+                return None
+            if not result.endswith(TRUNCATION_NOTICE):
+                # Stored as soon as it is ready, so a disconnect midway keeps the finished blocks
+                await run_in_threadpool(self.config_cache.put, key, block, result)
+            return result
+
+        misses = [i for i, cached in enumerate(findings) if cached is None]
+        generated = await asyncio.gather(*(analyze(blocks[i], keys[i]) for i in misses))
+        if misses and all(result is None for result in generated) and len(misses) == len(blocks):
+            raise DeadlineExceeded("No part of the configuration can be analyzed before the request deadline")
+        for i, result in zip(misses, generated):
+            if result is None:
+                # Answer with the blocks that were analyzed rather than nothing
+                current_deadline().mark_truncated()
+                result = BLOCK_SKIPPED_NOTICE
+            findings[i] = result
+
+        response = "\n\n".join(
+            f"### {block.location}\n{result}" for block, result in zip(blocks, findings)
+        )
+        self.conversation_history.append({
+            "user": f"Analyze this {config_type} configuration:\n{config_text}",
+            "assistant": response
+        })
         return response
 
-    async def generate_cpanel_solution(self, issue_description: str) -> str:
+    @staticmethod
+    def _block_prompt(block: ConfigBlock, config_type: str) -> str:
+        """Prompt for one block; it depends only on what the cache key covers"""
+        location = " > ".join(block.context) or "top level"
+        return f"""Analyze the following block of a {config_type} configuration.
+Focus on security, performance, and best practices.
+
+Location: {location}
+Block:
+{block.text}
+
+List the potential issues and improvement suggestions for this block only.
+
+Findings:"""
+
+    async def generate_cpanel_solution(
+        self,
+        issue_description: str,
+        parameters: Optional[Dict[str, Any]] = None
+    ) -> str:
         """Generate cPanel solutions with natural language understanding"""
-        prompt = f"""Provide a solution for the following cPanel/WHM issue.
+        response = await self._complete(self._cpanel_prompt(issue_description, parameters),
+                                        method="generate_cpanel_solution")
+        return response
+
+    async def generate_cpanel_alternatives(
+        self,
+        issue_description: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        num_alternatives: int = 1
+    ) -> List[str]:
+        """Generate up to num_alternatives distinct cPanel solutions, best first"""
+        return await self._complete_alternatives(
+            self._cpanel_prompt(issue_description, parameters), "generate_cpanel_solution", num_alternatives
+        )
+
+    @staticmethod
+    def _cpanel_prompt(issue_description: str, parameters: Optional[Dict[str, Any]]) -> str:
+        details = f"\nParameters: {json.dumps(parameters)}" if parameters else ""
+        return f"""Provide a solution for the following cPanel/WHM issue.
 Include step-by-step instructions and best practices.
 
-Issue: {issue_description}
+Issue: {issue_description}{details}
 
 Please provide:
 1. Problem analysis
@@ -234,6 +672,14 @@ Please provide:
 4. Additional resources
 
 Solution:"""
-        
-        response = self._get_completion(prompt)
-        return response 
\ No newline at end of file
+
+
+_ai_service: Optional[AIService] = None
+
+
+def get_ai_service() -> AIService:
+    """Get the process-wide AIService, loading the model on first use"""
+    global _ai_service
+    if _ai_service is None:
+        _ai_service = AIService()
+    return _ai_service
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""Deduplicating and ranking alternative answers sampled in one batched generation.
+
+Answers to shell requests are ranked by whether their code parses, then
+by the mean log-probability the model gave their tokens; other answers,
+such as a Dockerfile or a manifest, by log-probability alone. Both are
+cheap next to generating another answer.
+"""
+import re
+import shlex
+import shutil
+import subprocess
+from typing import List, Optional, Sequence
+
+# Sampling for alternatives: warmer than the default so the candidates differ
+ALTERNATIVES_TEMPERATURE = 0.9
+ALTERNATIVES_TOP_P = 0.95
+
+CODE_BLOCK_RE = re.compile(r"```([\w+-]*)[^\n]*\n(.*?)```", re.DOTALL)
+SHELL_LANGUAGES = ("bash", "sh", "shell", "console", "zsh")
+# Script types whose output is a shell script
+SHELL_SCRIPT_TYPES = ("shell", "bash", "sh", "zsh")
+SYNTAX_CHECK_TIMEOUT = 2.0
+
+
+def extract_code(text: str) -> Optional[re.Match]:
+    """The first fenced code block of an answer, if any"""
+    return CODE_BLOCK_RE.search(text)
+
+
+def shell_syntax_ok(code: str) -> bool:
+    """Whether code parses as a shell script, without running it"""
+    bash = shutil.which("bash")
+    if bash is None:
+        try:
+            shlex.split(code, comments=True)
+        except ValueError:
+            return False
+        return True
+    try:
+        checked = subprocess.run(
+            [bash, "-n"], input=code, capture_output=True, text=True, timeout=SYNTAX_CHECK_TIMEOUT
+        )
+    except subprocess.TimeoutExpired:
+        return False
+    return checked.returncode == 0
+
+
+def is_shell_script(script_type: str) -> bool:
+    """Whether a script request asks for a shell script"""
+    return script_type.strip().lower() in SHELL_SCRIPT_TYPES
+
+
+class Candidate:
+    """One sampled answer and the signals it is ranked by"""
+
+    def __init__(self, text: str, logprob: Optional[float], shell: bool = False):
+        self.text = text
+        self.logprob = logprob
+        block = extract_code(text)
+        self.code = block.group(2) if block else None
+        # True or False for shell code, None when there is no shell code to check
+        self.syntax_ok: Optional[bool] = None
+        # An unlabeled block is taken for shell only when shell was asked for
+        if shell and block is not None and block.group(1).lower() in SHELL_LANGUAGES + ("",):
+            self.syntax_ok = shell_syntax_ok(self.code)
+
+    @property
+    def key(self) -> str:
+        """What two candidates must share to count as the same answer"""
+        return " ".join((self.code if self.code is not None else self.text).split())
+
+    def rank(self):
+        syntax = {True: 1, None: 0, False: -1}[self.syntax_ok]
+        return syntax, self.logprob if self.logprob is not None else float("-inf")
+
+
+def rank_alternatives(texts: Sequence[str], logprobs: Optional[Sequence[float]] = None,
+                      shell: bool = False) -> List[str]:
+    """Distinct non-empty answers, best first; shell answers have their code syntax-checked"""
+    candidates = {}
+    for i, text in enumerate(texts):
+        if not text.strip():
+            continue
+        candidate = Candidate(text, logprobs[i] if logprobs is not None else None, shell)
+        best = candidates.get(candidate.key)
+        if best is None or candidate.rank() > best.rank():
+            candidates[candidate.key] = candidate
+    ranked = sorted(candidates.values(), key=Candidate.rank, reverse=True)
+    return [candidate.text for candidate in ranked]
\ No newline at end of file
@@ -0,0 +1,129 @@
+from typing import Any, Iterator, List, Optional, Tuple
+
+from app.core.cancellation import CancellationToken
+from app.core.deadline import Deadline
+from app.services.generation import GenerationProfile
+
+
+class GenerationRequest:
+    """What to generate: the full prompt plus sampling and stopping settings"""
+
+    def __init__(
+        self,
+        prompt: str,
+        profile: GenerationProfile,
+        max_new_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        do_sample: bool = True,
+        num_return_sequences: int = 1,
+        cancel: Optional[CancellationToken] = None,
+        deadline: Optional[Deadline] = None
+    ):
+        self.prompt = prompt
+        self.profile = profile
+        self.max_new_tokens = max_new_tokens or profile.max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.do_sample = do_sample
+        self.num_return_sequences = num_return_sequences
+        # Set when nobody will read the result any more
+        self.cancel = cancel
+        # Generation stops when this passes, and decodes no more tokens than fit before it
+        self.deadline = deadline
+        self.deadline_limited = (
+            deadline is not None and deadline.max_tokens is not None and deadline.max_tokens < self.max_new_tokens
+        )
+        if self.deadline_limited:
+            self.max_new_tokens = max(deadline.max_tokens, 1)
+
+    def budget_reason(self) -> str:
+        """Finish reason for a sequence that ran out of tokens or time"""
+        if self.deadline_limited or (self.deadline is not None and self.deadline.expired):
+            return "deadline"
+        return "budget"
+
+
+class GenerationResult:
+    """Generated texts with the token counts and timings needed for metrics"""
+
+    def __init__(
+        self,
+        texts: List[str],
+        finish_reasons: List[str],
+        prompt_tokens: int,
+        completion_tokens: int,
+        generate_start: float,
+        generate_end: float,
+        first_token_at: Optional[float] = None,
+        logprobs: Optional[List[float]] = None,
+        kv_cache_bytes: Optional[int] = None,
+        peak_memory_bytes: Optional[int] = None
+    ):
+        self.texts = texts
+        # One of "stop_string", "eos", "budget", "deadline" or "cancelled" per sequence
+        self.finish_reasons = finish_reasons
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.generate_start = generate_start
+        self.generate_end = generate_end
+        self.first_token_at = first_token_at
+        # Mean log-probability of each sequence's tokens, when the backend measured it
+        self.logprobs = logprobs
+        # Key/value cache size at the end of generation and peak memory growth while generating,
+        # when the backend generates in this process
+        self.kv_cache_bytes = kv_cache_bytes
+        self.peak_memory_bytes = peak_memory_bytes
+
+    @property
+    def text(self) -> str:
+        return self.texts[0]
+
+    @property
+    def batch_size(self) -> int:
+        return len(self.texts)
+
+
+class InferenceBackend:
+    """How AIService loads models and runs generation.
+
+    `load` returns an opaque (model, tokenizer) pair that the model pool keeps
+    resident; the other methods receive that pair back.
+    """
+
+    name = ""
+    # Async backends do their own I/O on the event loop instead of in the threadpool
+    is_async = False
+    # The service's ModelPool, for backends that load further models of their own into it
+    models = None
+
+    def load(self, model_name: str) -> Tuple[Any, Any]:
+        raise NotImplementedError
+
+    def tokenize(self, tokenizer: Any, text: str) -> List[int]:
+        raise NotImplementedError
+
+    def generate(self, model: Any, tokenizer: Any, request: GenerationRequest) -> GenerationResult:
+        raise NotImplementedError
+
+    def stream(self, model: Any, tokenizer: Any, request: GenerationRequest) -> Iterator[str]:
+        """Yield text chunks as they are generated; defaults to one final chunk"""
+        yield self.generate(model, tokenizer, request).text
+
+    async def agenerate(self, model: Any, tokenizer: Any, request: GenerationRequest) -> GenerationResult:
+        raise NotImplementedError
+
+
+def create_backend(name: str) -> InferenceBackend:
+    """Build the backend selected by INFERENCE_BACKEND"""
+    # Imported lazily so optional runtimes are only needed when selected
+    if name == "torch":
+        from app.services.backends.transformers_backend import TransformersBackend
+        return TransformersBackend()
+    if name == "onnx":
+        from app.services.backends.onnx_backend import OnnxRuntimeBackend
+        return OnnxRuntimeBackend()
+    if name == "http":
+        from app.services.backends.http_backend import HttpCompletionBackend
+        return HttpCompletionBackend()
+    raise ValueError(f"Unknown INFERENCE_BACKEND: {name}")
\ No newline at end of file
@@ -0,0 +1,344 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core import metrics, tracing
+from app.services.backends.base import GenerationRequest, GenerationResult, InferenceBackend
+from app.services.generation import CHARS_PER_TOKEN, find_stop, trim_response
+
+logger = logging.getLogger(__name__)
+
+# The OpenAI completions API accepts at most four stop strings
+MAX_STOP_STRINGS = 4
+# Fallback models share the service's model pool under their own keys, apart from the tiers' handles
+FALLBACK_KEY_PREFIX = "fallback:"
+
+
+class InferenceServerError(Exception):
+    """The inference server failed in a way worth retrying"""
+
+
+class ServerModel:
+    """Handle for a model served by the remote inference server"""
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        # The model the tier asked for, loaded in-process when the server is unavailable
+        self.source = source
+        # Weights live in the server process, not ours
+        self.nbytes = 0
+
+
+class CircuitBreaker:
+    """Stops calling a failing server for a while, then lets one trial request through"""
+
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> int:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def record_abandoned(self):
+        """A call ended without showing whether the server works; a half-open trial counts as failed"""
+        if self._trial_in_flight:
+            self.record_failure()
+
+
+class HttpCompletionBackend(InferenceBackend):
+    """Generation offloaded to a local OpenAI-compatible /v1/completions server.
+
+    Requests share one keep-alive connection pool. Transient failures are
+    retried with jittered exponential backoff; repeated failures open a
+    circuit breaker and generation falls back to the in-process model until
+    the server recovers.
+    """
+
+    name = "http"
+    is_async = True
+
+    def __init__(self, base_url: Optional[str] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = (base_url or settings.INFERENCE_SERVER_URL).rstrip("/")
+        self.transport = transport
+        self.breaker = CircuitBreaker(settings.CIRCUIT_BREAKER_FAILURES, settings.CIRCUIT_BREAKER_RESET_SECONDS)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._fallback = None
+        self._fallback_lock = threading.Lock()
+        metrics.inference_circuit_state.set_function(lambda: self.breaker.state)
+
+    def load(self, model_name: str) -> Tuple[Any, Any]:
+        return ServerModel(settings.INFERENCE_SERVER_MODEL or model_name, model_name), None
+
+    def tokenize(self, tokenizer: Any, text: str) -> List[int]:
+        raise NotImplementedError("Tokenization happens on the inference server")
+
+    def generate(self, model: Any, tokenizer: Any, request: GenerationRequest) -> GenerationResult:
+        raise NotImplementedError("HttpCompletionBackend is async; use agenerate")
+
+    def client(self) -> httpx.AsyncClient:
+        """The shared pooled client, created on first use inside the event loop"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=self.transport,
+                timeout=httpx.Timeout(
+                    settings.INFERENCE_SERVER_TIMEOUT, connect=settings.INFERENCE_SERVER_CONNECT_TIMEOUT
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.INFERENCE_SERVER_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.INFERENCE_SERVER_MAX_CONNECTIONS
+                )
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def agenerate(self, model: Any, tokenizer: Any, request: GenerationRequest) -> GenerationResult:
+        if self.breaker.allow():
+            try:
+                result = await self._with_retries(model, request)
+            except InferenceServerError as e:
+                self.breaker.record_failure()
+                metrics.inference_server_requests.labels("failure").inc()
+                logger.warning("Inference server failed, using in-process fallback: %s", e)
+            except BaseException:
+                # Cancelled or rejected: a half-open trial must not stay in flight forever
+                self.breaker.record_abandoned()
+                raise
+            else:
+                self.breaker.record_success()
+                metrics.inference_server_requests.labels("success").inc()
+                return result
+        return await self._fallback_generate(model, request)
+
+    async def astream(self, model: Any, tokenizer: Any, request: GenerationRequest) -> AsyncIterator[str]:
+        """Yield text of the first sequence as the server produces it"""
+        if self.breaker.allow():
+            text, emitted = "", 0
+            try:
+                async for kind, index, payload in self._events(model, request):
+                    if kind != "text" or index != 0:
+                        continue
+                    # The server applies stop strings itself; only a closing code fence is cut here
+                    text += payload
+                    cut = find_stop(text, request.profile)
+                    end = len(text) if cut is None else cut
+                    if end > emitted:
+                        yield text[emitted:end]
+                        emitted = end
+                    if cut is not None:
+                        break
+                self.breaker.record_success()
+                metrics.inference_server_requests.labels("success").inc()
+                return
+            except InferenceServerError as e:
+                self.breaker.record_failure()
+                metrics.inference_server_requests.labels("failure").inc()
+                if emitted:
+                    raise
+                logger.warning("Inference server failed, using in-process fallback: %s", e)
+            except BaseException:
+                # Cancelled, closed early or rejected: a half-open trial must not stay in flight forever
+                self.breaker.record_abandoned()
+                raise
+        result = await self._fallback_generate(model, request)
+        yield result.text
+
+    async def _with_retries(self, model: ServerModel, request: GenerationRequest) -> GenerationResult:
+        attempts = settings.INFERENCE_SERVER_RETRIES + 1
+        for attempt in range(attempts):
+            try:
+                return await self._complete_once(model, request)
+            except InferenceServerError:
+                if attempt == attempts - 1:
+                    raise
+                # Full jitter keeps retries from many workers from arriving together
+                backoff = settings.INFERENCE_SERVER_RETRY_BACKOFF * (2 ** attempt)
+                if request.deadline is not None and request.deadline.remaining() <= backoff:
+                    raise
+                metrics.inference_server_requests.labels("retry").inc()
+                await asyncio.sleep(random.uniform(0, backoff))
+
+    async def _complete_once(self, model: ServerModel, request: GenerationRequest) -> GenerationResult:
+        texts: Dict[int, str] = {}
+        server_reasons: Dict[int, Optional[str]] = {}
+        usage: Dict[str, int] = {}
+        logprob_sums: Dict[int, float] = {}
+        logprob_counts: Dict[int, int] = {}
+        chunks = 0
+        generate_start = time.perf_counter()
+        first_token_at = None
+
+        async for kind, index, payload in self._events(model, request):
+            if kind == "usage":
+                usage = payload
+            elif kind == "finish":
+                server_reasons[index] = payload
+            elif kind == "logprobs":
+                logprob_sums[index] = logprob_sums.get(index, 0.0) + sum(payload)
+                logprob_counts[index] = logprob_counts.get(index, 0) + len(payload)
+            elif payload:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                chunks += 1
+                texts[index] = texts.get(index, "") + payload
+        generate_end = time.perf_counter()
+
+        first = first_token_at or generate_end
+        tracing.record("prefill", generate_start, first)
+        tracing.record("decode", first, generate_end)
+
+        results, finish_reasons = [], []
+        for index in range(request.num_return_sequences):
+            text, stopped = trim_response(texts.get(index, ""), request.profile)
+            results.append(text)
+            if stopped:
+                finish_reasons.append("stop_string")
+            elif server_reasons.get(index) == "length":
+                finish_reasons.append(request.budget_reason())
+            elif index not in server_reasons and request.deadline is not None and request.deadline.expired:
+                # The stream was closed when the deadline passed
+                finish_reasons.append("deadline")
+            else:
+                finish_reasons.append("eos")
+
+        return GenerationResult(
+            texts=results,
+            finish_reasons=finish_reasons,
+            prompt_tokens=usage.get("prompt_tokens", len(request.prompt) // CHARS_PER_TOKEN),
+            completion_tokens=usage.get("completion_tokens", chunks),
+            generate_start=generate_start,
+            generate_end=generate_end,
+            first_token_at=first_token_at,
+            logprobs=[
+                logprob_sums.get(index, 0.0) / max(logprob_counts.get(index, 0), 1)
+                for index in range(request.num_return_sequences)
+            ] if logprob_counts else None
+        )
+
+    async def _events(self, model: ServerModel, request: GenerationRequest):
+        """Stream (kind, index, payload) events from one /v1/completions call.
+
+        kind is "text" for a text delta, "finish" for a finish_reason,
+        "logprobs" for the log-probabilities of a delta's tokens and "usage"
+        for token counts. The stream is closed early once every
+        sequence has reached a stop point, so the server stops decoding.
+        """
+        body = {
+            "model": model.name,
+            "prompt": request.prompt,
+            "max_tokens": request.max_new_tokens,
+            "temperature": request.temperature if request.do_sample else 0.0,
+            "top_p": request.top_p,
+            "n": request.num_return_sequences,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        if request.num_return_sequences > 1:
+            # Sampled token log-probabilities rank the alternatives
+            body["logprobs"] = 1
+        if request.profile.stop_strings:
+            body["stop"] = list(request.profile.stop_strings[:MAX_STOP_STRINGS])
+
+        texts: Dict[int, str] = {}
+        finished = set()
+        try:
+            async with self.client().stream("POST", "/v1/completions", json=body) as response:
+                if response.status_code >= 500 or response.status_code == 429:
+                    raise InferenceServerError(f"HTTP {response.status_code}")
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise RuntimeError(f"Inference server rejected request: HTTP {response.status_code} {response.text}")
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    if chunk.get("usage"):
+                        yield "usage", 0, chunk["usage"]
+                    for choice in chunk.get("choices") or []:
+                        index = choice.get("index", 0)
+                        text = choice.get("text") or ""
+                        token_logprobs = (choice.get("logprobs") or {}).get("token_logprobs")
+                        if token_logprobs and index not in finished:
+                            yield "logprobs", index, [lp for lp in token_logprobs if lp is not None]
+                        if text:
+                            texts[index] = texts.get(index, "") + text
+                            yield "text", index, text
+                            if find_stop(texts[index], request.profile) is not None:
+                                finished.add(index)
+                        if choice.get("finish_reason"):
+                            yield "finish", index, choice["finish_reason"]
+                    if len(finished) >= request.num_return_sequences:
+                        break
+                    if request.deadline is not None and request.deadline.expired:
+                        # Closing the stream stops the server decoding; the text so far is kept
+                        break
+        except (httpx.TransportError, json.JSONDecodeError) as e:
+            raise InferenceServerError(str(e) or type(e).__name__) from e
+
+    async def _fallback_generate(self, model: ServerModel, request: GenerationRequest) -> GenerationResult:
+        if not settings.INFERENCE_FALLBACK_BACKEND:
+            raise RuntimeError("Inference server is unavailable and no fallback backend is configured")
+        metrics.inference_server_requests.labels("fallback").inc()
+        return await run_in_threadpool(tracing.call_profiled, self._fallback_sync, model, request)
+
+    def _fallback_sync(self, model: ServerModel, request: GenerationRequest) -> GenerationResult:
+        """Generate in-process with the tier's model, borrowed from the service's model pool.
+
+        The pool loads it the first time it is needed and counts it against
+        MODEL_MEMORY_BUDGET_MB, so an idle fallback model is unloaded like any other.
+        """
+        if self.models is None:
+            raise RuntimeError("Inference server is unavailable and no model pool holds the fallback model")
+        with self._fallback_lock:
+            if self._fallback is None:
+                from app.services.backends.base import create_backend
+                self._fallback = create_backend(settings.INFERENCE_FALLBACK_BACKEND)
+        fallback = self._fallback
+        with self.models.acquire(FALLBACK_KEY_PREFIX + model.source, lambda _: fallback.load(model.source)) as loaded:
+            return fallback.generate(loaded.model, loaded.tokenizer, request)
\ No newline at end of file
@@ -0,0 +1,58 @@
+import logging
+from pathlib import Path
+from typing import Any, Tuple
+
+from transformers import AutoTokenizer
+
+from app.core.config import settings
+from app.services.backends.transformers_backend import TransformersBackend
+
+try:
+    import onnxruntime as ort
+    from optimum.onnxruntime import ORTModelForCausalLM
+except ImportError:  # onnxruntime and optimum are optional, only needed for this backend
+    ort = None
+    ORTModelForCausalLM = None
+
+logger = logging.getLogger(__name__)
+
+
+class OnnxRuntimeBackend(TransformersBackend):
+    """CPU generation on an ONNX Runtime export of the model.
+
+    The export keeps past key/values as graph inputs and outputs, so each
+    decode step only runs the new token through the graph. Generation goes
+    through the same transformers generate loop as the PyTorch backend, which
+    keeps stop strings, sampling and metrics identical between the two.
+    """
+
+    name = "onnx"
+
+    def load(self, model_name: str) -> Tuple[Any, Any]:
+        if ORTModelForCausalLM is None:
+            raise RuntimeError("INFERENCE_BACKEND=onnx needs the optimum[onnxruntime] package")
+
+        export_dir = Path(settings.ONNX_EXPORT_DIR) / model_name.replace("/", "--")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if settings.ONNX_NUM_THREADS:
+            options.intra_op_num_threads = settings.ONNX_NUM_THREADS
+
+        if (export_dir / "config.json").exists():
+            model = ORTModelForCausalLM.from_pretrained(
+                export_dir, use_cache=True, session_options=options, provider="CPUExecutionProvider"
+            )
+            tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        else:
+            logger.info("Exporting %s to ONNX in %s", model_name, export_dir)
+            model = ORTModelForCausalLM.from_pretrained(
+                model_name, export=True, use_cache=True, session_options=options, provider="CPUExecutionProvider"
+            )
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model.save_pretrained(export_dir)
+            tokenizer.save_pretrained(export_dir)
+
+        model.config.pad_token_id = tokenizer.eos_token_id
+        # ORT sessions have no parameters() to walk; size the pool entry from the graph files
+        model.nbytes = sum(path.stat().st_size for path in export_dir.glob("*.onnx*"))
+        return model, tokenizer
\ No newline at end of file
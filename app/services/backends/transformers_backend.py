@@ -0,0 +1,304 @@
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import torch
+from transformers import (
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    LogitsProcessor,
+    LogitsProcessorList,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextIteratorStreamer
+)
+
+from app.core import tracing
+from app.core.cancellation import CancellationToken
+from app.core.deadline import Deadline
+from app.core.memory import process_rss_bytes
+from app.services.backends.base import GenerationRequest, GenerationResult, InferenceBackend
+from app.services.generation import CODE_FENCE, GenerationProfile, find_stop, trim_response
+
+
+class TokenTimer(StoppingCriteria):
+    """Records when the first token is produced; never stops generation"""
+
+    def __init__(self):
+        self.first_token_at: Optional[float] = None
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        return False
+
+
+class MemoryHighWater(StoppingCriteria):
+    """Tracks how far memory grows during one generation; never stops generation.
+
+    On CUDA the allocator's own peak is read at the end. On CPU process RSS
+    is sampled every decode step, which costs microseconds next to the
+    step; concurrent generations in other threads show up in it too.
+    """
+
+    def __init__(self, device: torch.device):
+        self.device = device
+        self.cuda = device.type == "cuda"
+        if self.cuda:
+            torch.cuda.reset_peak_memory_stats(device)
+            self.start = torch.cuda.memory_allocated(device)
+        else:
+            self.start = process_rss_bytes()
+        self.peak = self.start
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        if not self.cuda:
+            self.peak = max(self.peak, process_rss_bytes())
+        return False
+
+    def growth(self) -> int:
+        if self.cuda:
+            self.peak = torch.cuda.max_memory_allocated(self.device)
+        else:
+            self.peak = max(self.peak, process_rss_bytes())
+        return max(self.peak - self.start, 0)
+
+
+def kv_cache_bytes(model: Any, rows: int, tokens: int) -> Optional[int]:
+    """Size of the key/value cache holding rows sequences of tokens each, from the model config"""
+    config = getattr(model, "config", None)
+    layers = getattr(config, "num_hidden_layers", None)
+    heads = getattr(config, "num_attention_heads", None)
+    hidden = getattr(config, "hidden_size", None)
+    if not (layers and heads and hidden):
+        return None
+    kv_heads = getattr(config, "num_key_value_heads", None) or heads
+    head_dim = getattr(config, "head_dim", None) or hidden // heads
+    element = torch.empty((), dtype=getattr(model, "dtype", torch.float32)).element_size()
+    # One key and one value vector per layer, head and position
+    return 2 * layers * kv_heads * head_dim * rows * tokens * element
+
+
+class StopOnStrings(StoppingCriteria):
+    """Stops generation once every sequence has produced a stop string.
+
+    Only a short window of recent tokens is decoded per step, so the check
+    costs far less than the decode step it may save. The full text is only
+    decoded when a code fence shows up in the window.
+    """
+
+    def __init__(self, tokenizer, prompt_length: int, profile: GenerationProfile, window: int = 16):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.profile = profile
+        self.window = window
+        self.done: List[bool] = []
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        if not self.done:
+            self.done = [False] * input_ids.shape[0]
+
+        start = max(self.prompt_length, input_ids.shape[1] - self.window)
+        for row, finished in enumerate(self.done):
+            if finished:
+                continue
+            tail = self.tokenizer.decode(input_ids[row, start:], skip_special_tokens=True)
+            if any(stop in tail for stop in self.profile.stop_strings):
+                self.done[row] = True
+            elif self.profile.stop_after_code_block and CODE_FENCE in tail:
+                text = self.tokenizer.decode(input_ids[row, self.prompt_length:], skip_special_tokens=True)
+                self.done[row] = find_stop(text, self.profile) is not None
+        return all(self.done)
+
+
+class TokenLogProbs(LogitsProcessor):
+    """Sums the log-probability the model gave each sequence's sampled tokens; never changes the scores.
+
+    Each step scores the token sampled from the previous step's
+    distribution, so only one step of log-probabilities is kept. Rows stop
+    counting after EOS or a stop string, so padding after the answer does
+    not drag its score down.
+    """
+
+    def __init__(self, eos_token_id: int, stopper: StopOnStrings):
+        self.eos_token_id = eos_token_id
+        self.stopper = stopper
+        self.previous: Optional[torch.Tensor] = None
+        self.sums: Optional[torch.Tensor] = None
+        self.counts: Optional[torch.Tensor] = None
+        self.active: Optional[torch.Tensor] = None
+
+    def _collect(self, chosen: torch.Tensor):
+        logprobs = self.previous.gather(1, chosen.unsqueeze(1)).squeeze(1)
+        self.sums += torch.where(self.active, logprobs, torch.zeros_like(logprobs))
+        self.counts += self.active.float()
+        self.active &= chosen != self.eos_token_id
+        if self.stopper.done:
+            self.active &= ~torch.tensor(self.stopper.done, device=chosen.device)
+
+    def __call__(self, input_ids, scores):
+        if self.previous is None:
+            rows = input_ids.shape[0]
+            self.sums = torch.zeros(rows, dtype=torch.float32, device=input_ids.device)
+            self.counts = torch.zeros(rows, dtype=torch.float32, device=input_ids.device)
+            self.active = torch.ones(rows, dtype=torch.bool, device=input_ids.device)
+        else:
+            self._collect(input_ids[:, -1])
+        self.previous = torch.log_softmax(scores.float(), dim=-1)
+        return scores
+
+    def means(self, outputs: torch.Tensor) -> Optional[List[float]]:
+        """Mean log-probability per sequence, once generate has returned its output ids"""
+        if self.previous is None:
+            return None
+        # The last sampled token was never followed by another processor call
+        self._collect(outputs[:, -1])
+        return (self.sums / self.counts.clamp(min=1)).tolist()
+
+
+class StopOnCancel(StoppingCriteria):
+    """Stops generation at the next decode step once the request is cancelled"""
+
+    def __init__(self, token: CancellationToken):
+        self.token = token
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.token.cancelled
+
+
+class StopAtDeadline(StoppingCriteria):
+    """Stops generation at the next decode step once the request deadline has passed"""
+
+    def __init__(self, deadline: Deadline):
+        self.deadline = deadline
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.deadline.expired
+
+
+class TransformersBackend(InferenceBackend):
+    """Eager PyTorch generation through transformers' generate"""
+
+    name = "torch"
+
+    def load(self, model_name: str) -> Tuple[Any, Any]:
+        """Initialize the model and tokenizer with enhanced capabilities"""
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.float16,
+            device_map="auto"
+        )
+        # Enable model features for better conversation
+        model.config.pad_token_id = tokenizer.eos_token_id
+        model.config.use_cache = True
+        return model, tokenizer
+
+    def tokenize(self, tokenizer: Any, text: str) -> List[int]:
+        return tokenizer(text)["input_ids"]
+
+    def _generate_kwargs(self, tokenizer: Any, request: GenerationRequest) -> Dict[str, Any]:
+        return {
+            "max_new_tokens": request.max_new_tokens,
+            "num_return_sequences": request.num_return_sequences,
+            "temperature": request.temperature,
+            "top_p": request.top_p,
+            "do_sample": request.do_sample,
+            "pad_token_id": tokenizer.eos_token_id,
+            "eos_token_id": tokenizer.eos_token_id,
+        }
+
+    def _stopping_criteria(self, request: GenerationRequest, *criteria: StoppingCriteria) -> StoppingCriteriaList:
+        if request.cancel is not None:
+            criteria += (StopOnCancel(request.cancel),)
+        if request.deadline is not None:
+            criteria += (StopAtDeadline(request.deadline),)
+        return StoppingCriteriaList(criteria)
+
+    def generate(self, model: Any, tokenizer: Any, request: GenerationRequest) -> GenerationResult:
+        with tracing.span("tokenize"):
+            inputs = tokenizer(request.prompt, return_tensors="pt").to(model.device)
+        prompt_tokens = inputs["input_ids"].shape[1]
+        timer = TokenTimer()
+        stopper = StopOnStrings(tokenizer, prompt_tokens, request.profile)
+        high_water = MemoryHighWater(model.device)
+        kwargs = self._generate_kwargs(tokenizer, request)
+        scorer = None
+        if request.num_return_sequences > 1:
+            # Log-probabilities rank the alternatives
+            scorer = TokenLogProbs(tokenizer.eos_token_id, stopper)
+            kwargs["logits_processor"] = LogitsProcessorList([scorer])
+
+        generate_start = time.perf_counter()
+        # The prompt is tokenized once and expanded to num_return_sequences rows inside generate,
+        # so every alternative comes out of the same batched prefill and decode steps
+        outputs = model.generate(
+            **inputs,
+            **kwargs,
+            stopping_criteria=self._stopping_criteria(request, timer, stopper, high_water)
+        )
+        generate_end = time.perf_counter()
+        first_token_at = timer.first_token_at or generate_end
+        tracing.record("prefill", generate_start, first_token_at)
+        tracing.record("decode", first_token_at, generate_end, tokens=outputs.shape[1] - prompt_tokens)
+
+        # Decode only the generated tokens, then cut at the first stop string
+        texts, finish_reasons = [], []
+        with tracing.span("detokenize"):
+            for row in outputs[:, prompt_tokens:]:
+                text, stopped = trim_response(tokenizer.decode(row, skip_special_tokens=True), request.profile)
+                texts.append(text)
+                if request.cancel is not None and request.cancel.cancelled:
+                    finish_reasons.append("cancelled")
+                elif stopped:
+                    finish_reasons.append("stop_string")
+                elif (row == tokenizer.eos_token_id).any().item():
+                    finish_reasons.append("eos")
+                else:
+                    finish_reasons.append(request.budget_reason())
+
+        return GenerationResult(
+            texts=texts,
+            finish_reasons=finish_reasons,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=(outputs.shape[1] - prompt_tokens) * outputs.shape[0],
+            generate_start=generate_start,
+            generate_end=generate_end,
+            first_token_at=timer.first_token_at,
+            logprobs=scorer.means(outputs) if scorer is not None else None,
+            kv_cache_bytes=kv_cache_bytes(model, outputs.shape[0], outputs.shape[1]),
+            peak_memory_bytes=high_water.growth()
+        )
+
+    def stream(self, model: Any, tokenizer: Any, request: GenerationRequest) -> Iterator[str]:
+        """Yield text as it is decoded, ending at the first stop string"""
+        inputs = tokenizer(request.prompt, return_tensors="pt").to(model.device)
+        stopper = StopOnStrings(tokenizer, inputs["input_ids"].shape[1], request.profile)
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        kwargs = self._generate_kwargs(tokenizer, request)
+        kwargs["num_return_sequences"] = 1
+        worker = threading.Thread(
+            target=model.generate,
+            kwargs={**inputs, **kwargs, "streamer": streamer, "stopping_criteria": self._stopping_criteria(request, stopper)},
+            daemon=True
+        )
+        worker.start()
+
+        # Hold back enough text that a stop string split across chunks is never emitted
+        holdback = max((len(stop) for stop in request.profile.stop_strings), default=0)
+        text, emitted = "", 0
+        for chunk in streamer:
+            text += chunk
+            cut = find_stop(text, request.profile)
+            if cut is not None:
+                if cut > emitted:
+                    yield text[emitted:cut]
+                emitted = len(text)
+                break
+            safe = len(text) - holdback
+            if safe > emitted:
+                yield text[emitted:safe]
+                emitted = safe
+        if emitted < len(text):
+            yield text[emitted:]
+        worker.join()
\ No newline at end of file
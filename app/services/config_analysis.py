@@ -0,0 +1,262 @@
+"""Structural splitting of configuration files and a content-addressed findings cache.
+
+A config is split into blocks along its own structure: brace sections for
+nginx-style files, <Tag> sections for Apache httpd, and paragraphs for
+everything else. Adjacent small blocks in the same section are then merged,
+so a short file is not spread over one generation per directive. Each
+block's findings are stored on disk under a hash of the block, its
+enclosing sections, the config type and the model, so a resubmitted config
+only needs generation for the blocks that changed.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from typing import Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Bump when the block prompt changes so stale findings are not reused
+CACHE_VERSION = 2
+# Sections larger than this are split into their own directives and their child sections
+MAX_BLOCK_CHARS = 1000
+# Blocks smaller than this are merged with their neighbours in the same section, up to MAX_BLOCK_CHARS
+MIN_BLOCK_CHARS = 400
+# Every this many writes, the oldest entries beyond the size limit are deleted
+PRUNE_EVERY = 256
+
+TAG_OPEN_RE = re.compile(r"^\s*<([A-Za-z][\w.:-]*)(\s[^>]*)?>\s*$")
+TAG_CLOSE_RE = re.compile(r"^\s*</([A-Za-z][\w.:-]*)\s*>\s*$")
+INI_SECTION_RE = re.compile(r"^\s*\[[^\]]+\]\s*$")
+
+
+class ConfigBlock:
+    """One structural block of a config and the headers of the sections enclosing it"""
+
+    def __init__(self, context: Tuple[str, ...], text: str):
+        self.context = context
+        self.text = text
+
+    @property
+    def location(self) -> str:
+        first_line = self.text.strip().splitlines()[0]
+        return " > ".join(_label(header) for header in self.context + (first_line,))
+
+    def normalized(self) -> str:
+        """Block text with indentation and blank lines removed, so reformatting keeps its hash"""
+        return "\n".join(line.strip() for line in self.text.splitlines() if line.strip())
+
+
+class _Section:
+    def __init__(self, header: Optional[str]):
+        self.header = header
+        # Lines and child sections in file order
+        self.items: List[Union[str, "_Section"]] = []
+
+    def lines(self) -> Iterator[str]:
+        for item in self.items:
+            if isinstance(item, _Section):
+                yield from item.lines()
+            else:
+                yield item
+
+    def text(self) -> str:
+        return "\n".join(self.lines())
+
+    def own_text(self) -> str:
+        """The section without its child sections"""
+        return "\n".join(item for item in self.items if isinstance(item, str))
+
+    @property
+    def children(self) -> List["_Section"]:
+        return [item for item in self.items if isinstance(item, _Section)]
+
+
+def _label(header: str) -> str:
+    """A section's opening line without its brace, for headings"""
+    return header.strip().rstrip("{").strip()
+
+
+def _strip_comment(line: str) -> str:
+    return line.split("#", 1)[0].strip()
+
+
+def _parse(lines: List[str], opens, closes) -> _Section:
+    """Nest lines into sections using the given open and close line tests"""
+    root = _Section(None)
+    stack = [root]
+    for line in lines:
+        if opens(line):
+            section = _Section(line.strip())
+            section.items.append(line)
+            stack[-1].items.append(section)
+            stack.append(section)
+        elif closes(line) and len(stack) > 1:
+            stack.pop().items.append(line)
+        else:
+            stack[-1].items.append(line)
+    return root
+
+
+def _brace_opens(line: str) -> bool:
+    code = _strip_comment(line)
+    return code.endswith("{") and code.count("{") > code.count("}")
+
+
+def _brace_closes(line: str) -> bool:
+    return _strip_comment(line).startswith("}")
+
+
+def _flatten(section: _Section, context: Tuple[str, ...]) -> Iterator[ConfigBlock]:
+    text = section.text()
+    if section.header is not None and (len(text) <= MAX_BLOCK_CHARS or not section.children):
+        yield ConfigBlock(context, text)
+        return
+
+    # Too large to analyze in one go (or the file itself): its own directives, then each child
+    own = section.own_text()
+    if section.header is None:
+        if own.strip():
+            yield ConfigBlock(context, own)
+        inner = context
+    else:
+        # Opening and closing lines alone say nothing worth analyzing
+        if sum(1 for item in section.items if isinstance(item, str) and _strip_comment(item)) > 2:
+            yield ConfigBlock(context, own)
+        inner = context + (section.header,)
+    for child in section.children:
+        yield from _flatten(child, inner)
+
+
+def _paragraphs(lines: List[str]) -> Iterator[ConfigBlock]:
+    """Split at unindented lines after a blank line, and at [section] headers"""
+    current: List[str] = []
+    previous_blank = False
+    for line in lines:
+        starts_block = INI_SECTION_RE.match(line) or (previous_blank and line[:1].strip())
+        if starts_block and any(l.strip() for l in current):
+            yield ConfigBlock((), "\n".join(current))
+            current = []
+        current.append(line)
+        previous_blank = not line.strip()
+    if any(l.strip() for l in current):
+        yield ConfigBlock((), "\n".join(current))
+
+
+def _merge_small(blocks: List[ConfigBlock]) -> List[ConfigBlock]:
+    """Join runs of adjacent blocks sharing a context while either side is under MIN_BLOCK_CHARS"""
+    merged: List[ConfigBlock] = []
+    for block in blocks:
+        previous = merged[-1] if merged else None
+        if (previous is not None and previous.context == block.context
+                and min(len(previous.text), len(block.text)) < MIN_BLOCK_CHARS
+                and len(previous.text) + len(block.text) < MAX_BLOCK_CHARS):
+            merged[-1] = ConfigBlock(block.context, previous.text + "\n" + block.text)
+        else:
+            merged.append(block)
+    return merged
+
+
+def split_config(config_text: str) -> List[ConfigBlock]:
+    """Split a config into the structural blocks it is analyzed and cached by.
+
+    The syntax is detected from the text, since callers often send "general"
+    as the config type.
+    """
+    lines = config_text.splitlines()
+    if any(TAG_OPEN_RE.match(line) for line in lines):
+        root = _parse(lines, lambda line: bool(TAG_OPEN_RE.match(line)), lambda line: bool(TAG_CLOSE_RE.match(line)))
+    elif any(_brace_opens(line) for line in lines):
+        root = _parse(lines, _brace_opens, _brace_closes)
+    else:
+        return _merge_small(list(_paragraphs(lines)))
+    return _merge_small([block for block in _flatten(root, ()) if block.normalized()])
+
+
+class ConfigAnalysisCache:
+    """Findings per config block, stored on disk under the hash of everything that produced them.
+
+    Entries are never rewritten, only added, so concurrent workers can share
+    a directory. Reads refresh an entry's mtime, and the least recently used
+    entries are pruned once there are more than max_entries. An empty
+    directory disables the cache.
+    """
+
+    def __init__(self, directory: str, max_entries: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    @staticmethod
+    def key(block: ConfigBlock, config_type: str, model: str) -> str:
+        payload = json.dumps([CACHE_VERSION, config_type.lower(), model, block.context, block.normalized()])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key[2:] + ".json")
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                findings = json.load(f)["findings"]
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            logger.warning("Ignoring unreadable config analysis cache entry %s", path)
+            return None
+        return findings
+
+    def put(self, key: str, block: ConfigBlock, findings: str):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"location": block.location, "findings": findings}, f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """Delete the least recently used entries beyond max_entries; returns how many"""
+        if not self.enabled or self.max_entries <= 0 or not os.path.isdir(self.directory):
+            return 0
+        entries = []
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                entries.extend(
+                    (entry.stat().st_mtime, entry.path) for entry in os.scandir(shard.path)
+                    if entry.name.endswith(".json")
+                )
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return 0
+        entries.sort()
+        for _, path in entries[:excess]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        return excess
\ No newline at end of file
@@ -0,0 +1,101 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+# Markers that mean the model has started inventing the next conversation turn
+CONVERSATION_STOPS = ("\nUser:", "\nCurrent user query:", "\nPrevious conversation:", "\nAssistant:")
+CODE_FENCE = "```"
+
+# Rough characters-per-token ratio for estimating token counts without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# The original generate call used max_length=1000 for prompt plus completion
+LEGACY_MAX_LENGTH = 1000
+
+# Appended to answers cut short to meet the request deadline
+TRUNCATION_NOTICE = "\n\n[Response truncated: the request deadline was reached before generation finished.]"
+
+
+class ThroughputEstimate:
+    """Moving averages of one model's prefill and decode speed, used to fit generations into deadlines"""
+
+    def __init__(self, smoothing: float = 0.2):
+        self.smoothing = smoothing
+        self.prefill_seconds_per_token: Optional[float] = None
+        self.decode_tokens_per_second: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.decode_tokens_per_second is not None
+
+    def _average(self, current: Optional[float], sample: float) -> float:
+        return sample if current is None else current + self.smoothing * (sample - current)
+
+    def observe(self, prompt_tokens: int, prefill_seconds: float, decode_steps: int, decode_seconds: float):
+        if prompt_tokens > 0 and prefill_seconds > 0:
+            self.prefill_seconds_per_token = self._average(self.prefill_seconds_per_token,
+                                                           prefill_seconds / prompt_tokens)
+        if decode_steps > 0 and decode_seconds > 0:
+            self.decode_tokens_per_second = self._average(self.decode_tokens_per_second,
+                                                          decode_steps / decode_seconds)
+
+    def seconds_for(self, prompt_tokens: int, new_tokens: int) -> float:
+        """Expected time to prefill the prompt and decode new_tokens"""
+        prefill = prompt_tokens * (self.prefill_seconds_per_token or 0.0)
+        return prefill + new_tokens / self.decode_tokens_per_second
+
+    def tokens_within(self, seconds: float, prompt_tokens: int) -> int:
+        """How many tokens can be decoded in the given time after prefilling the prompt"""
+        decode_seconds = seconds - prompt_tokens * (self.prefill_seconds_per_token or 0.0)
+        return max(int(decode_seconds * self.decode_tokens_per_second), 0)
+
+
+class GenerationProfile:
+    """Decode budget and stop rules for one kind of request"""
+
+    def __init__(self, max_new_tokens: int, stop_strings: Sequence[str] = CONVERSATION_STOPS,
+                 stop_after_code_block: bool = False):
+        self.max_new_tokens = max_new_tokens
+        self.stop_strings = tuple(stop_strings)
+        # When the answer opens with a code fence, its closing fence ends the answer
+        self.stop_after_code_block = stop_after_code_block
+
+
+GENERATION_PROFILES: Dict[str, GenerationProfile] = {
+    "chat": GenerationProfile(256),
+    "generate_linux_command": GenerationProfile(192, stop_after_code_block=True),
+    "generate_script": GenerationProfile(768, stop_after_code_block=True),
+    "analyze_config": GenerationProfile(512),
+    "analyze_config_block": GenerationProfile(192),
+    "generate_cpanel_solution": GenerationProfile(384),
+}
+
+
+def get_profile(method: str) -> GenerationProfile:
+    return GENERATION_PROFILES.get(method, GENERATION_PROFILES["chat"])
+
+
+def find_stop(text: str, profile: GenerationProfile) -> Optional[int]:
+    """Index at which a generated answer should be cut, or None if it is not finished"""
+    cut = None
+    for stop in profile.stop_strings:
+        index = text.find(stop)
+        if index != -1 and (cut is None or index < cut):
+            cut = index
+
+    if profile.stop_after_code_block:
+        stripped = text.lstrip()
+        if stripped.startswith(CODE_FENCE):
+            offset = len(text) - len(stripped)
+            closing = stripped.find(CODE_FENCE, len(CODE_FENCE))
+            if closing != -1:
+                end = offset + closing + len(CODE_FENCE)
+                if cut is None or end < cut:
+                    cut = end
+    return cut
+
+
+def trim_response(text: str, profile: GenerationProfile) -> Tuple[str, bool]:
+    """Cut a generated answer at its first stop point; returns (text, stopped)"""
+    cut = find_stop(text, profile)
+    if cut is None:
+        return text.strip(), False
+    return text[:cut].strip(), True
\ No newline at end of file
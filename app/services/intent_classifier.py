@@ -0,0 +1,255 @@
+"""Hashed n-gram linear intent classifier.
+
+Text is mapped to a fixed-size vector of signed, hashed word unigrams,
+word bigrams and character trigrams, and scored by one linear layer. The
+softmax is temperature-scaled on cross-validated logits, which come from
+models trained like the shipped one but without the example scored, so
+the probability of the top label can be read as a confidence.
+
+The weights ship as app/services/data/intent_model.npz and are trained
+offline from the bundled labeled examples:
+
+    python -m app.services.intent_classifier
+"""
+import json
+import logging
+import re
+import sys
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+EXAMPLES_PATH = DATA_DIR / "intent_examples.jsonl"
+MODEL_PATH = DATA_DIR / "intent_model.npz"
+
+LABELS = ("general", "command_generation", "script_creation", "config_analysis", "cpanel_solution")
+HASH_BITS = 14
+# Only the start of a request says what kind of request it is
+MAX_CHARS = 512
+WORD_RE = re.compile(r"[a-z0-9_]+")
+
+
+# Distinct crc32 seeds keep the three n-gram kinds apart in the hash space
+WORD_SEED, BIGRAM_SEED, TRIGRAM_SEED = 1, 2, 3
+
+
+def _hashed_ngrams(text: str) -> List[int]:
+    """crc32 hashes of the word unigrams, word bigrams and character trigrams of one text"""
+    words = [word.encode() for word in WORD_RE.findall(text[:MAX_CHARS].lower())]
+    crc32 = zlib.crc32
+    hashes = [crc32(word, WORD_SEED) for word in words]
+    hashes += [crc32(b"%s %s" % pair, BIGRAM_SEED) for pair in zip(words, words[1:])]
+    for word in words:
+        padded = b"<%s>" % word
+        hashes += [crc32(padded[i:i + 3], TRIGRAM_SEED) for i in range(len(padded) - 2)]
+    return hashes
+
+
+def _hashed_row(text: str) -> Dict[int, float]:
+    """Signed hashed n-gram counts of one text, keyed by column.
+
+    Each n-gram adds +1 or -1 to its column; the sign bit keeps hash
+    collisions from adding up in one direction.
+    """
+    mask = (1 << HASH_BITS) - 1
+    counts: Dict[int, float] = {}
+    for h in _hashed_ngrams(text):
+        column = h & mask
+        counts[column] = counts.get(column, 0.0) + (1.0 if h >> 31 else -1.0)
+    return counts
+
+
+def sparse_features(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rows of the L2-normalized feature matrix as (offsets, columns, values).
+
+    Row i holds columns[offsets[i]:offsets[i + 1]] and the matching values.
+    """
+    lengths, columns, values = [], [], []
+    for text in texts:
+        row = _hashed_row(text)
+        lengths.append(len(row))
+        columns.extend(row)
+        values.extend(row.values())
+    columns = np.array(columns, dtype=np.intp)
+    values = np.array(values, dtype=np.float32)
+    offsets = np.zeros(len(texts) + 1, dtype=np.intp)
+    np.cumsum(lengths, out=offsets[1:])
+
+    nonempty = offsets[:-1] < offsets[1:]
+    norms = np.zeros(len(texts), dtype=np.float32)
+    if len(values):
+        norms[nonempty] = np.sqrt(np.add.reduceat(values * values, offsets[:-1][nonempty]))
+    values /= np.repeat(norms, lengths)
+    return offsets, columns, values
+
+
+def featurize(texts: Sequence[str]) -> np.ndarray:
+    """Dense feature matrix of shape (len(texts), 2**HASH_BITS), used for training"""
+    offsets, columns, values = sparse_features(texts)
+    matrix = np.zeros((len(texts), 1 << HASH_BITS), dtype=np.float32)
+    rows = np.repeat(np.arange(len(texts)), np.diff(offsets))
+    np.add.at(matrix, (rows, columns), values)
+    return matrix
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class IntentClassifier:
+    """Scores texts against LABELS with one sparse matrix product per batch"""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, temperature: float = 1.0,
+                 labels: Sequence[str] = LABELS):
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.temperature = float(temperature)
+        self.labels = tuple(labels)
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """Calibrated label probabilities, shape (len(texts), len(labels))"""
+        offsets, columns, values = sparse_features(texts)
+        logits = np.tile(self.bias, (len(texts), 1))
+        if len(columns):
+            # Sparse-dense product: gather the weight rows of active columns, sum per text
+            contributions = self.weights[columns] * values[:, None]
+            nonempty = offsets[:-1] < offsets[1:]
+            logits[nonempty] += np.add.reduceat(contributions, offsets[:-1][nonempty], axis=0)
+        return _softmax(logits / self.temperature)
+
+    def classify(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """Most likely label and its probability for each text"""
+        probs = self.predict_proba(texts)
+        best = probs.argmax(axis=1)
+        return [(self.labels[i], float(probs[row, i])) for row, i in enumerate(best)]
+
+    def classify_one(self, text: str) -> Tuple[str, float]:
+        return self.classify([text])[0]
+
+    def save(self, path: Path = MODEL_PATH):
+        np.savez_compressed(
+            path,
+            weights=self.weights.astype(np.float16),
+            bias=self.bias,
+            temperature=np.float32(self.temperature),
+            labels=np.array(self.labels),
+            hash_bits=np.int32(HASH_BITS),
+        )
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> "IntentClassifier":
+        with np.load(path) as data:
+            if int(data["hash_bits"]) != HASH_BITS:
+                raise ValueError(f"{path} was trained with a different feature size; retrain it")
+            return cls(data["weights"], data["bias"], float(data["temperature"]), [str(l) for l in data["labels"]])
+
+
+def load_examples(path: Path = EXAMPLES_PATH) -> Tuple[List[str], np.ndarray]:
+    texts, labels = [], []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                example = json.loads(line)
+                texts.append(example["text"])
+                labels.append(LABELS.index(example["label"]))
+    return texts, np.array(labels)
+
+
+def _fit(features: np.ndarray, labels: np.ndarray, epochs: int = 300, learning_rate: float = 0.5,
+         l2: float = 1e-4) -> Tuple[np.ndarray, np.ndarray]:
+    """Multinomial logistic regression by full-batch gradient descent"""
+    n, dim = features.shape
+    weights = np.zeros((dim, len(LABELS)), dtype=np.float32)
+    bias = np.zeros(len(LABELS), dtype=np.float32)
+    targets = np.eye(len(LABELS), dtype=np.float32)[labels]
+    for _ in range(epochs):
+        grad = (_softmax(features @ weights + bias) - targets) / n
+        weights -= learning_rate * (features.T @ grad + l2 * weights)
+        bias -= learning_rate * grad.sum(axis=0)
+    return weights, bias
+
+
+def _fit_temperature(logits: np.ndarray, labels: np.ndarray) -> float:
+    """Temperature minimizing the negative log-likelihood of out-of-sample logits"""
+    best, best_nll = 1.0, np.inf
+    for temperature in np.linspace(0.05, 3.0, 60):
+        probs = _softmax(logits / temperature)
+        nll = -np.log(probs[np.arange(len(labels)), labels] + 1e-12).mean()
+        if nll < best_nll:
+            best, best_nll = float(temperature), nll
+    return best
+
+
+def stratified_folds(labels: np.ndarray, folds: int = 5, seed: int = 0) -> np.ndarray:
+    """Fold number of each example, with every label spread evenly over the folds"""
+    rng = np.random.default_rng(seed)
+    fold = np.zeros(len(labels), dtype=np.intp)
+    for label in range(len(LABELS)):
+        members = rng.permutation(np.flatnonzero(labels == label))
+        fold[members] = np.arange(len(members)) % folds
+    return fold
+
+
+def cross_validated_logits(features: np.ndarray, labels: np.ndarray, folds: int = 5, seed: int = 0) -> np.ndarray:
+    """Logits of each example from a model trained on the other folds"""
+    fold = stratified_folds(labels, folds, seed)
+    logits = np.zeros((len(labels), len(LABELS)), dtype=np.float32)
+    for k in range(folds):
+        held_out = fold == k
+        weights, bias = _fit(features[~held_out], labels[~held_out])
+        logits[held_out] = features[held_out] @ weights + bias
+    return logits
+
+
+def train(examples_path: Path = EXAMPLES_PATH, folds: int = 5, seed: int = 0) -> Tuple[IntentClassifier, Dict]:
+    """Train on every labeled example, calibrated on cross-validated logits"""
+    texts, labels = load_examples(examples_path)
+    features = featurize(texts)
+
+    # Fitting the temperature on one holdout model and shipping a refit would calibrate a different model
+    logits = cross_validated_logits(features, labels, folds, seed)
+    temperature = _fit_temperature(logits, labels)
+    probs = _softmax(logits / temperature)
+    report = {
+        "examples": len(texts),
+        "cross_validated_accuracy": float((probs.argmax(axis=1) == labels).mean()),
+        "cross_validated_mean_confidence": float(probs.max(axis=1).mean()),
+        "temperature": temperature,
+    }
+
+    weights, bias = _fit(features, labels)
+    return IntentClassifier(weights, bias, temperature), report
+
+
+_classifier: Optional[IntentClassifier] = None
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """Get the shared classifier, training it in-process if the weights file is missing"""
+    global _classifier
+    if _classifier is None:
+        try:
+            _classifier = IntentClassifier.load()
+        except FileNotFoundError:
+            logger.warning("%s not found; training the intent classifier at startup", MODEL_PATH)
+            _classifier, _ = train()
+    return _classifier
+
+
+def main() -> int:
+    classifier, report = train()
+    classifier.save()
+    print(json.dumps(report, indent=2))
+    print(f"Saved {MODEL_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
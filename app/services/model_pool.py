@@ -0,0 +1,262 @@
+import gc
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core import metrics
+from app.services.scheduler import FairShareScheduler, parse_client_weights
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIER = "large"
+SMALL_TIER = "small"
+
+# Methods whose answers are short lookups and fit a small, fast model
+SMALL_MODEL_METHODS = ("generate_linux_command", "generate_cpanel_solution")
+# Pool keys may carry a "#<version>" suffix so a checkpoint can be reloaded beside its live copy
+VERSION_SEPARATOR = "#"
+
+
+def source_name(key: str) -> str:
+    """The model name or path a pool key loads from"""
+    return key.split(VERSION_SEPARATOR, 1)[0]
+
+
+class LoadedModel:
+    """A model and tokenizer resident in memory"""
+
+    def __init__(self, name: str, model: Any, tokenizer: Any, load_seconds: float):
+        self.name = name
+        self.model = model
+        self.tokenizer = tokenizer
+        self.load_seconds = load_seconds
+        self.nbytes = parameter_bytes(model)
+        self.last_used = time.monotonic()
+        self.active = 0
+
+
+class ModelTier:
+    """A routing target: which model serves it and its own inference slots"""
+
+    def __init__(self, name: str, model_name: str, concurrency: int):
+        self.name = name
+        self.model_name = model_name
+        self.scheduler = FairShareScheduler(concurrency, settings.SCHEDULER_QUANTUM_TOKENS,
+                                            parse_client_weights(settings.SCHEDULER_CLIENT_WEIGHTS))
+        metrics.inference_queue_depth.labels(name).set_function(lambda: self.scheduler.pending)
+        metrics.inference_running.labels(name).set_function(lambda: self.scheduler.running)
+
+
+def parameter_bytes(model: Any) -> int:
+    """Bytes held by a model's parameters and buffers"""
+    if not hasattr(model, "parameters"):
+        # Backends without torch modules report their own size
+        return getattr(model, "nbytes", 0)
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelPool:
+    """Keeps models resident within a memory budget, unloading idle ones LRU-first"""
+
+    def __init__(self, loader: Callable[[str], Tuple[Any, Any]], memory_budget_bytes: int = 0):
+        self.loader = loader
+        self.memory_budget_bytes = memory_budget_bytes
+        self._loaded: Dict[str, LoadedModel] = {}
+        # The tier whose current model is never unloaded for the budget
+        self.pinned_tier: Optional[ModelTier] = None
+        self._lock = threading.Lock()
+        # from_pretrained patches module globals while loading, so loads run one at a time
+        self._load_lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, model_name: str, loader: Optional[Callable[[str], Tuple[Any, Any]]] = None):
+        """Borrow a loaded model for one generation, loading it if needed.
+
+        `loader` stands in for the pool's own when the model comes from another
+        backend, such as the HTTP backend's fallback; it shares the one budget.
+        """
+        entry = self._checkout(model_name, loader)
+        try:
+            yield entry
+        finally:
+            self._return(entry)
+
+    @contextmanager
+    def acquire_tier(self, tier: ModelTier):
+        """Borrow whichever model serves a tier right now.
+
+        The tier's model is read and borrowed under one lock, so a hot swap
+        cannot unload it between a request choosing it and using it.
+        """
+        with self._lock:
+            entry = self._loaded.get(tier.model_name)
+            if entry is not None:
+                entry.active += 1
+        if entry is None:
+            entry = self._checkout(tier.model_name)
+        try:
+            yield entry
+        finally:
+            self._return(entry)
+
+    def _return(self, entry: LoadedModel):
+        with self._lock:
+            entry.active -= 1
+            entry.last_used = time.monotonic()
+        # Evictions skipped while this model was busy can happen now
+        self._enforce_budget()
+
+    def _checkout(self, model_name: str, loader: Optional[Callable[[str], Tuple[Any, Any]]] = None) -> LoadedModel:
+        with self._lock:
+            entry = self._loaded.get(model_name)
+            if entry is not None:
+                entry.active += 1
+                return entry
+
+        # Concurrent requests for the same cold model wait for one load
+        with self._load_lock:
+            with self._lock:
+                entry = self._loaded.get(model_name)
+                if entry is not None:
+                    entry.active += 1
+                    return entry
+            entry = self._load(model_name, loader or self.loader)
+            with self._lock:
+                entry.active += 1
+                self._loaded[model_name] = entry
+        self._enforce_budget()
+        return entry
+
+    def _load(self, model_name: str, loader: Callable[[str], Tuple[Any, Any]]) -> LoadedModel:
+        start = time.perf_counter()
+        model, tokenizer = loader(source_name(model_name))
+        entry = LoadedModel(model_name, model, tokenizer, time.perf_counter() - start)
+        metrics.model_load_seconds.labels(model_name).set(entry.load_seconds)
+        metrics.model_resident_bytes.labels(model_name).set(entry.nbytes)
+        logger.info("Loaded model %s (%.1f MB) in %.2fs", model_name, entry.nbytes / 2**20, entry.load_seconds)
+        return entry
+
+    def pin_tier(self, tier: ModelTier):
+        """Load a tier's model now and keep whichever model serves it out of eviction"""
+        self.pinned_tier = tier
+        with self._load_lock:
+            entry = self._loaded.get(tier.model_name)
+            if entry is None:
+                entry = self._load(tier.model_name, self.loader)
+                with self._lock:
+                    self._loaded[tier.model_name] = entry
+        self.fit_budget(entry)
+
+    def fit_budget(self, entry: LoadedModel):
+        """Raise a budget the pinned model alone exceeds, warning once here.
+
+        Checked when the pinned model loads rather than on every generation;
+        other models still unload as soon as they are idle.
+        """
+        if self.memory_budget_bytes and entry.nbytes > self.memory_budget_bytes:
+            logger.warning("MODEL_MEMORY_BUDGET_MB is %.1f MB but model %s needs %.1f MB; raising the budget to fit it",
+                           self.memory_budget_bytes / 2**20, entry.name, entry.nbytes / 2**20)
+            self.memory_budget_bytes = entry.nbytes
+
+    def _enforce_budget(self):
+        """Unload least recently used idle models until within the memory budget"""
+        if not self.memory_budget_bytes:
+            return
+        evicted: List[LoadedModel] = []
+        with self._lock:
+            pinned = self.pinned_tier.model_name if self.pinned_tier is not None else None
+            resident = sum(entry.nbytes for entry in self._loaded.values())
+            idle = sorted(
+                (entry for entry in self._loaded.values() if entry.active == 0 and entry.name != pinned),
+                key=lambda entry: entry.last_used
+            )
+            for entry in idle:
+                if resident <= self.memory_budget_bytes:
+                    break
+                del self._loaded[entry.name]
+                resident -= entry.nbytes
+                evicted.append(entry)
+        for entry in evicted:
+            self._release(entry)
+        if resident > self.memory_budget_bytes:
+            logger.warning("Resident models use %.1f MB, over the %.1f MB budget",
+                           resident / 2**20, self.memory_budget_bytes / 2**20)
+
+    def active_count(self, model_name: str) -> int:
+        """Generations currently borrowing a model; 0 if it is not loaded"""
+        with self._lock:
+            entry = self._loaded.get(model_name)
+            return entry.active if entry is not None else 0
+
+    def is_loaded(self, model_name: str) -> bool:
+        with self._lock:
+            return model_name in self._loaded
+
+    def unload(self, model_name: str) -> bool:
+        """Unload a model now if it is idle"""
+        with self._lock:
+            entry = self._loaded.get(model_name)
+            if entry is None or entry.active:
+                return False
+            del self._loaded[model_name]
+        self._release(entry)
+        return True
+
+    def _release(self, entry: LoadedModel):
+        logger.info("Unloading model %s", entry.name)
+        metrics.model_evictions.labels(entry.name).inc()
+        metrics.model_resident_bytes.labels(entry.name).set(0)
+        entry.model = None
+        entry.tokenizer = None
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "model": entry.name,
+                    "bytes": entry.nbytes,
+                    "active": entry.active,
+                    "idle_seconds": time.monotonic() - entry.last_used,
+                    "load_seconds": entry.load_seconds,
+                }
+                for entry in self._loaded.values()
+            ]
+
+
+class ModelRouter:
+    """Chooses a model tier for a request from its intent and size"""
+
+    def __init__(self, tiers: Dict[str, ModelTier], small_max_prompt_chars: int):
+        self.tiers = tiers
+        self.small_max_prompt_chars = small_max_prompt_chars
+
+    def select(self, method: str, prompt: str) -> ModelTier:
+        tier = DEFAULT_TIER
+        if (SMALL_TIER in self.tiers and method in SMALL_MODEL_METHODS
+                and len(prompt) <= self.small_max_prompt_chars):
+            tier = SMALL_TIER
+        metrics.model_routes.labels(tier, method).inc()
+        return self.tiers[tier]
+
+
+def build_tiers() -> Dict[str, ModelTier]:
+    """Model tiers from settings; the small tier exists only if a small model is configured"""
+    tiers = {DEFAULT_TIER: ModelTier(DEFAULT_TIER, settings.AI_MODEL_NAME, settings.INFERENCE_CONCURRENCY)}
+    if settings.AI_SMALL_MODEL_NAME and settings.AI_SMALL_MODEL_NAME != settings.AI_MODEL_NAME:
+        tiers[SMALL_TIER] = ModelTier(
+            SMALL_TIER, settings.AI_SMALL_MODEL_NAME, settings.SMALL_MODEL_CONCURRENCY
+        )
+    return tiers
\ No newline at end of file
@@ -0,0 +1,166 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core import metrics
+from app.services.backends.base import GenerationRequest, GenerationResult, InferenceBackend
+from app.services.generation import GenerationProfile, get_profile
+from app.services.model_pool import VERSION_SEPARATOR, LoadedModel, ModelPool, ModelTier
+
+logger = logging.getLogger(__name__)
+
+WARMUP_PROMPT = "Hello"
+SMOKE_PROMPT = "Generate a Linux command to show disk usage of the current directory.\n\nCommand:"
+SMOKE_MAX_NEW_TOKENS = 16
+DRAIN_POLL_SECONDS = 0.05
+
+
+class SwapStatus:
+    """Progress and phase timings of one hot swap"""
+
+    def __init__(self, swap_id: int, tier: str, model: str, previous: str):
+        self.id = swap_id
+        self.tier = tier
+        self.model = model
+        self.previous = previous
+        # loading -> warming -> draining -> done, or failed
+        self.state = "loading"
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.timings: Dict[str, float] = {}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "tier": self.tier,
+            "model": self.model,
+            "previous": self.previous,
+            "state": self.state,
+            "error": self.error,
+            "started_at": self.started_at,
+            "timings": {phase: round(seconds, 4) for phase, seconds in self.timings.items()},
+        }
+
+
+class ModelSwapper:
+    """Switches a tier to a new model version without dropping requests.
+
+    The new model is loaded and warmed up beside the live one. Requests that
+    start after the switch use the new model; generations already running
+    finish on the old one, which is unloaded once they have drained.
+    """
+
+    def __init__(self, pool: ModelPool, tiers: Dict[str, ModelTier], backend: InferenceBackend):
+        self.pool = pool
+        self.tiers = tiers
+        self.backend = backend
+        self.history: deque = deque(maxlen=10)
+        self._ids = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def busy(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, tier_name: str, model_name: str) -> SwapStatus:
+        """Begin swapping a tier to model_name in the background"""
+        tier = self.tiers.get(tier_name)
+        if tier is None:
+            raise ValueError(f"Unknown model tier: {tier_name}")
+        if self.busy:
+            raise RuntimeError("A model swap is already in progress")
+
+        status = SwapStatus(next(self._ids), tier_name, model_name, tier.model_name)
+        self.history.appendleft(status)
+        self._task = asyncio.ensure_future(self._run(tier, status))
+        return status
+
+    def statuses(self) -> List[Dict[str, Any]]:
+        return [status.as_dict() for status in self.history]
+
+    def _pool_key(self, status: SwapStatus) -> str:
+        """Pool key for the new model, versioned when the name is already resident"""
+        if self.pool.is_loaded(status.model) or any(
+            tier.model_name == status.model for tier in self.tiers.values()
+        ):
+            return f"{status.model}{VERSION_SEPARATOR}{status.id}"
+        return status.model
+
+    async def _run(self, tier: ModelTier, status: SwapStatus):
+        key = self._pool_key(status)
+        # Hold the new model until the switch so the memory budget cannot evict it first
+        borrowed = self.pool.acquire(key)
+        try:
+            start = time.perf_counter()
+            entry = await run_in_threadpool(borrowed.__enter__)
+            self._timing(status, "load", start)
+        except Exception as e:
+            self._fail(status, e)
+            return
+
+        try:
+            status.state = "warming"
+            start = time.perf_counter()
+            await self._generate(entry, GenerationRequest(WARMUP_PROMPT, GenerationProfile(1), do_sample=False))
+            self._timing(status, "warmup", start)
+
+            start = time.perf_counter()
+            result = await self._generate(entry, GenerationRequest(
+                SMOKE_PROMPT, get_profile("generate_linux_command"), SMOKE_MAX_NEW_TOKENS, do_sample=False
+            ))
+            if result.completion_tokens <= 0:
+                raise RuntimeError("Smoke prompt produced no tokens")
+            self._timing(status, "smoke", start)
+        except Exception as e:
+            await run_in_threadpool(borrowed.__exit__, None, None, None)
+            await run_in_threadpool(self.pool.unload, key)
+            self._fail(status, e)
+            return
+
+        # Requests read tier.model_name when they borrow a model, so this is the switch
+        status.previous, tier.model_name = tier.model_name, key
+        if tier is self.pool.pinned_tier:
+            self.pool.fit_budget(entry)
+        status.state = "draining"
+        await run_in_threadpool(borrowed.__exit__, None, None, None)
+        logger.info("Tier %s switched from %s to %s", tier.name, status.previous, key)
+
+        start = time.perf_counter()
+        await self._drain(status.previous)
+        self._timing(status, "drain", start)
+        status.state = "done"
+        metrics.model_swaps.labels("success").inc()
+
+    async def _generate(self, entry: LoadedModel, request: GenerationRequest) -> GenerationResult:
+        if self.backend.is_async:
+            return await self.backend.agenerate(entry.model, entry.tokenizer, request)
+        return await run_in_threadpool(self.backend.generate, entry.model, entry.tokenizer, request)
+
+    async def _drain(self, previous: str):
+        """Unload the old model once its in-flight generations finish"""
+        if any(tier.model_name == previous for tier in self.tiers.values()):
+            # Another tier still serves it
+            return
+        deadline = time.monotonic() + settings.MODEL_SWAP_DRAIN_TIMEOUT
+        # Requests resolve and borrow a tier's model in one step, so none can pick the old one from here on
+        while self.pool.active_count(previous) and time.monotonic() < deadline:
+            await asyncio.sleep(DRAIN_POLL_SECONDS)
+        if not await run_in_threadpool(self.pool.unload, previous) and self.pool.is_loaded(previous):
+            logger.warning("Model %s still busy after %.0fs; leaving it to the memory budget",
+                           previous, settings.MODEL_SWAP_DRAIN_TIMEOUT)
+
+    def _timing(self, status: SwapStatus, phase: str, start: float):
+        status.timings[phase] = time.perf_counter() - start
+        metrics.model_swap_seconds.labels(phase).set(status.timings[phase])
+
+    def _fail(self, status: SwapStatus, error: Exception):
+        status.state = "failed"
+        status.error = str(error) or type(error).__name__
+        metrics.model_swaps.labels("failed").inc()
+        logger.exception("Swapping tier %s to %s failed", status.tier, status.model)
\ No newline at end of file
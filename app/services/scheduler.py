@@ -0,0 +1,148 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+
+def parse_client_weights(spec: str) -> Dict[str, float]:
+    """Parse "address=weight,..." into weights keyed like the rate limiter's client keys"""
+    weights = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        address, _, weight = entry.rpartition("=")
+        if not address.strip():
+            raise ValueError(f"Invalid client weight {entry.strip()!r}; expected address=weight")
+        weights[f"ip:{address.strip()}"] = float(weight)
+    return weights
+
+
+class _Ticket:
+    """A queued request for an inference slot"""
+
+    __slots__ = ("cost", "future")
+
+    def __init__(self, cost: float, future: asyncio.Future):
+        self.cost = cost
+        self.future = future
+
+
+class FairShareScheduler:
+    """Deficit round-robin scheduler for inference slots.
+
+    Each client gets its own queue. Clients are visited in turn and earn
+    `quantum * weight` tokens of credit per visit; a request is admitted once
+    its client has credit for its estimated token cost. Heavy requests from one
+    client therefore cannot starve light requests from others.
+    """
+
+    def __init__(self, concurrency: int = 1, quantum: float = 256.0, weights: Optional[Dict[str, float]] = None):
+        self.concurrency = max(1, concurrency)
+        self.quantum = float(quantum)
+        self._queues: Dict[str, Deque[_Ticket]] = {}
+        self._deficits: Dict[str, float] = {}
+        self._weights: Dict[str, float] = {}
+        for key, weight in (weights or {}).items():
+            self.set_weight(key, weight)
+        self._active: Deque[str] = deque()
+        self._running = 0
+        self._running_cost = 0.0
+
+    @property
+    def pending(self) -> int:
+        """Number of requests waiting for a slot"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def running(self) -> int:
+        """Number of requests currently holding a slot"""
+        return self._running
+
+    def backlog(self) -> float:
+        """Estimated tokens of work ahead of a newly queued request.
+
+        Running requests are assumed half done on average.
+        """
+        queued = sum(ticket.cost for queue in self._queues.values() for ticket in queue)
+        return queued + self._running_cost / 2
+
+    def set_weight(self, key: str, weight: float):
+        """Give a client a larger or smaller share of inference time"""
+        self._weights[key] = max(weight, 0.01)
+
+    @asynccontextmanager
+    async def slot(self, key: str, cost: float, max_wait: Optional[float] = None):
+        """Wait for an inference slot on behalf of `key`, holding it for the block.
+
+        Raises asyncio.TimeoutError if no slot is granted within max_wait seconds.
+        """
+        ticket = _Ticket(max(cost, 1.0), asyncio.get_running_loop().create_future())
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._deficits[key] = 0.0
+            self._active.append(key)
+        queue.append(ticket)
+        self._dispatch()
+
+        try:
+            if max_wait is None:
+                await ticket.future
+            else:
+                await asyncio.wait_for(ticket.future, max(max_wait, 0.0))
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if ticket.future.done() and not ticket.future.cancelled():
+                # Granted just as we were cancelled; hand the slot back
+                self._release(ticket)
+            else:
+                self._discard(key, ticket)
+            raise
+
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    def _release(self, ticket: _Ticket):
+        self._running -= 1
+        self._running_cost -= ticket.cost
+        self._dispatch()
+
+    def _discard(self, key: str, ticket: _Ticket):
+        """Remove a waiter that gave up before being admitted"""
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+        try:
+            queue.remove(ticket)
+        except ValueError:
+            return
+        if not queue:
+            self._deactivate(key)
+
+    def _deactivate(self, key: str):
+        del self._queues[key]
+        del self._deficits[key]
+        self._active.remove(key)
+
+    def _dispatch(self):
+        """Admit queued requests in deficit round-robin order while slots are free"""
+        while self._running < self.concurrency and self._active:
+            key = self._active[0]
+            queue = self._queues[key]
+            ticket = queue[0]
+            if self._deficits[key] < ticket.cost:
+                self._deficits[key] += self.quantum * self._weights.get(key, 1.0)
+                self._active.rotate(-1)
+                continue
+
+            queue.popleft()
+            self._deficits[key] -= ticket.cost
+            if not queue:
+                # Idle clients do not bank credit
+                self._deactivate(key)
+            if ticket.future.cancelled():
+                continue
+            ticket.future.set_result(None)
+            self._running += 1
+            self._running_cost += ticket.cost
\ No newline at end of file
@@ -0,0 +1,78 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple, Type, TypeVar
+
+from app.core import metrics, tracing
+
+T = TypeVar("T")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so trivially different copies of a prompt share a key"""
+    return " ".join(prompt.split())
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its result.
+
+    The call runs as its own task in the first caller's context. Each caller
+    awaits it through a shield, so one caller disconnecting does not cancel
+    the work for the others; the call is cancelled only when every caller
+    has gone.
+
+    A follower waits at most its own timeout. Errors listed in unshared_errors
+    belong to the caller whose call raised them (its deadline, say), so a
+    follower receiving one runs the call again itself.
+    """
+
+    def __init__(self, name: str, unshared_errors: Tuple[Type[BaseException], ...] = ()):
+        self.name = name
+        self.unshared_errors = unshared_errors
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]], timeout: Optional[float] = None) -> T:
+        """Run fn, or share the identical call in flight; raises asyncio.TimeoutError if following takes too long"""
+        flight = self._flights.get(key)
+        if flight is None or flight.task.done():
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            metrics.single_flight_calls.labels(self.name, "leader").inc()
+            # The leader's own call enforces the leader's limits
+            return await self._wait(key, flight)
+
+        metrics.single_flight_calls.labels(self.name, "follower").inc()
+        started = asyncio.get_event_loop().time()
+        try:
+            with tracing.span("coalesced"):
+                return await self._wait(key, flight, timeout)
+        except self.unshared_errors:
+            if timeout is not None:
+                timeout -= asyncio.get_event_loop().time() - started
+                if timeout <= 0:
+                    raise
+            return await self.do(key, fn, timeout)
+
+    async def _wait(self, key: Hashable, flight: _Flight, timeout: Optional[float] = None):
+        flight.waiters += 1
+        try:
+            # wait_for cancels only the shield on timeout, never the shared call
+            return await asyncio.wait_for(asyncio.shield(flight.task), timeout)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller left; stop the work and let the next caller start afresh
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
\ No newline at end of file
@@ -0,0 +1,69 @@
+// Chat functionality
+function sendMessage() {
+    const input = document.getElementById('user-input');
+    const message = input.value.trim();
+    if (!message) return;
+
+    // Add user message
+    addMessage(message, 'user');
+    input.value = '';
+
+    // Send to backend
+    fetch('/api/v1/assistant/chat', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ message }),
+    })
+    .then(response => response.json())
+    .then(data => {
+        addMessage(data.response, 'assistant');
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        addMessage('Sorry, there was an error processing your request.', 'assistant');
+    });
+}
+
+function addMessage(message, sender) {
+    const messagesDiv = document.getElementById('chat-messages');
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'flex items-start space-x-3';
+    
+    const icon = sender === 'user' ? 'fa-user' : 'fa-robot';
+    const bgColor = sender === 'user' ? 'bg-green-500' : 'bg-blue-500';
+    
+    messageDiv.innerHTML = `
+        <div class="flex-shrink-0">
+            <div class="w-8 h-8 rounded-full ${bgColor} flex items-center justify-center">
+                <i class="fas ${icon} text-white"></i>
+            </div>
+        </div>
+        <div class="flex-1 bg-gray-100 rounded-lg p-4">
+            <p class="text-gray-800">${message}</p>
+        </div>
+    `;
+    
+    messagesDiv.appendChild(messageDiv);
+    messagesDiv.scrollTop = messagesDiv.scrollHeight;
+}
+
+function quickAction(action) {
+    const prompts = {
+        command: "Generate a command to list all running processes sorted by memory usage",
+        cicd: "Create a GitHub Actions workflow for a Python application",
+        system: "How do I configure systemd services in AlmaLinux?",
+        monitoring: "Create a monitoring script for server resources"
+    };
+    
+    document.getElementById('user-input').value = prompts[action];
+    sendMessage();
+}
+
+// Handle Enter key
+document.getElementById('user-input').addEventListener('keypress', function(e) {
+    if (e.key === 'Enter') {
+        sendMessage();
+    }
+});
\ No newline at end of file
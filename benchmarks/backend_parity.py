@@ -0,0 +1,78 @@
+"""Check ONNX Runtime output against PyTorch and compare decode speed.
+
+Greedy decoding on the same prompts must produce the same tokens from an
+fp32 PyTorch reference and the ONNX Runtime export. Each inference backend
+is then timed as configured for serving and tokens/sec is reported.
+
+    python -m benchmarks.backend_parity
+    python -m benchmarks.backend_parity --model facebook/opt-350m --tokens 64
+"""
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.stub_model import DEFAULT_DIR, build_stub_model
+
+PROMPTS = [
+    "How do I check which process is listening on port 8080?",
+    "Write a bash script that rotates nginx logs every day.",
+    "Analyze this config: worker_processes auto; events { worker_connections 1024; }",
+]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="ONNX Runtime parity and speed check")
+    parser.add_argument("--model", help="model name or path (default: local stub model)")
+    parser.add_argument("--tokens", type=int, default=32, help="new tokens per prompt")
+    parser.add_argument("--runs", type=int, default=3, help="timed runs per prompt")
+    args = parser.parse_args(argv)
+
+    model_name = args.model or str(build_stub_model(DEFAULT_DIR))
+    os.environ["AI_MODEL_NAME"] = model_name
+    os.environ.setdefault("ONNX_EXPORT_DIR", str(Path(tempfile.gettempdir()) / "sumiya-onnx"))
+
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    from app.services.backends.base import GenerationRequest, create_backend
+    from app.services.generation import GenerationProfile
+
+    # No stop strings, so every backend decodes the full budget
+    profile = GenerationProfile(args.tokens, stop_strings=())
+    onnx = create_backend("onnx")
+    ort_model, tokenizer = onnx.load(model_name)
+    reference = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float32)
+
+    failures = 0
+    for prompt in PROMPTS:
+        inputs = tokenizer(prompt, return_tensors="pt")
+        kwargs = dict(max_new_tokens=args.tokens, min_new_tokens=args.tokens, do_sample=False,
+                      pad_token_id=tokenizer.eos_token_id)
+        expected = reference.generate(**inputs, **kwargs)[0].tolist()
+        actual = ort_model.generate(**inputs, **kwargs)[0].tolist()
+        if expected != actual:
+            failures += 1
+            mismatch = next(i for i, (a, b) in enumerate(zip(expected, actual)) if a != b)
+            print(f"MISMATCH at token {mismatch}: {prompt!r}")
+    print(f"parity: {len(PROMPTS) - failures}/{len(PROMPTS)} prompts match")
+
+    for name in ("torch", "onnx"):
+        backend = create_backend(name)
+        model, tokenizer = (ort_model, tokenizer) if name == "onnx" else backend.load(model_name)
+        generated, elapsed = 0, 0.0
+        for prompt in PROMPTS:
+            request = GenerationRequest(prompt, profile, do_sample=False)
+            backend.generate(model, tokenizer, request)  # warm up
+            for _ in range(args.runs):
+                result = backend.generate(model, tokenizer, request)
+                generated += result.completion_tokens
+                elapsed += result.generate_end - result.generate_start
+        print(f"{name:<6} {generated / elapsed:8.1f} tokens/sec")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
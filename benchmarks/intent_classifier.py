@@ -0,0 +1,82 @@
+"""Compare the intent classifier with the keyword scan it replaced.
+
+Accuracy and calibration are cross-validated over the bundled labeled
+examples: each is scored by a classifier trained on the other folds, so no
+example is scored by a model that saw it. The temperature is fitted the way
+train() fits it for the shipped classifier. Latency is reported for single
+texts and batches.
+
+    python -m benchmarks.intent_classifier
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from app.services.intent_classifier import (
+    LABELS, _fit_temperature, _softmax, cross_validated_logits, featurize, get_intent_classifier, load_examples
+)
+
+
+def keyword_intent(text: str) -> str:
+    """The substring scan _understand_intent used before the classifier"""
+    text = text.lower()
+    if any(word in text for word in ["command", "run", "execute", "how to", "show me"]):
+        return "command_generation"
+    if any(word in text for word in ["script", "create", "write", "make", "generate"]):
+        return "script_creation"
+    if any(word in text for word in ["config", "analyze", "check", "verify", "test"]):
+        return "config_analysis"
+    if any(word in text for word in ["cpanel", "whm", "hosting", "website", "domain"]):
+        return "cpanel_solution"
+    return "general"
+
+
+def expected_calibration_error(confidences: np.ndarray, correct: np.ndarray, bins: int = 10) -> float:
+    edges = np.linspace(0, 1, bins + 1)
+    error = 0.0
+    for low, high in zip(edges, edges[1:]):
+        members = (confidences > low) & (confidences <= high)
+        if members.any():
+            error += members.mean() * abs(confidences[members].mean() - correct[members].mean())
+    return float(error)
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Intent classifier accuracy and latency")
+    parser.add_argument("--repeat", type=int, default=2000, help="timed calls per measurement")
+    args = parser.parse_args(argv)
+
+    texts, labels = load_examples()
+    logits = cross_validated_logits(featurize(texts), labels)
+    temperature = _fit_temperature(logits, labels)
+    probs = _softmax(logits / temperature)
+    predicted = probs.argmax(axis=1)
+    keyword = np.array([LABELS.index(keyword_intent(text)) for text in texts])
+
+    print(f"examples:             {len(texts)}")
+    print(f"keyword accuracy:     {(keyword == labels).mean():.3f}")
+    print(f"classifier accuracy:  {(predicted == labels).mean():.3f}")
+    print(f"mean confidence:      {probs.max(axis=1).mean():.3f}")
+    print(f"calibration error:    {expected_calibration_error(probs.max(axis=1), predicted == labels):.3f}")
+
+    shipped = get_intent_classifier()
+    sample = "how do I check which process is listening on port 8080"
+    batch = texts[:64]
+    print(f"keyword scan:         {timed(lambda: keyword_intent(sample), args.repeat) * 1e6:8.1f} us")
+    print(f"classify one:         {timed(lambda: shipped.classify_one(sample), args.repeat) * 1e6:8.1f} us")
+    per_text = timed(lambda: shipped.classify(batch), max(args.repeat // 64, 1)) / len(batch)
+    print(f"classify batch of 64: {per_text * 1e6:8.1f} us per text")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
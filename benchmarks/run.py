@@ -0,0 +1,273 @@
+"""Offline load test for the Sumiya API.
+
+Runs the real FastAPI app in-process against a tiny stub model, drives the
+assistant and devops routes at a fixed concurrency and reports throughput,
+latency percentiles, time to first token and memory use. Results are saved
+as JSON and can be compared against a previous run to catch regressions.
+Any failed request fails the run, since its latencies would not be comparable.
+
+    python -m benchmarks.run --concurrency 4 --requests 40 --output results.json
+    python -m benchmarks.run --compare baseline.json --threshold 0.10
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.stub_model import DEFAULT_DIR, build_stub_model
+
+# Phases reported in Server-Timing that happen after the first token
+POST_FIRST_TOKEN_PHASES = ("decode", "detokenize")
+
+SCENARIOS = {
+    "chat": ("/api/v1/assistant/chat", {"message": "why is mysql down after the last update?"}),
+    "command": ("/api/v1/assistant/command", {"description": "show disk usage sorted by size"}),
+    "script": ("/api/v1/assistant/script", {"requirements": "rotate nginx logs daily and keep 7 days"}),
+    "analyze": ("/api/v1/assistant/analyze", {
+        "config": "server {\n    listen 80;\n    server_name example.com;\n    root /var/www/html;\n}\n",
+        "type": "nginx",
+    }),
+    "devops_pipeline": ("/api/v1/devops/generate-pipeline", {
+        "script_type": "pipeline", "task_description": "build and test a python package on push",
+    }),
+    "devops_dockerfile": ("/api/v1/devops/generate-dockerfile", {
+        "script_type": "dockerfile", "task_description": "containerize a fastapi app",
+    }),
+    "devops_kubernetes": ("/api/v1/devops/generate-kubernetes", {
+        "script_type": "kubernetes", "task_description": "deployment with 3 replicas and a service",
+    }),
+    "devops_analyze": ("/api/v1/devops/analyze-infrastructure", {
+        "config_content": "resources:\n  limits:\n    memory: 1G\n", "config_type": "kubernetes",
+    }),
+    "devops_monitoring": ("/api/v1/devops/monitoring-setup", {
+        "script_type": "monitoring", "task_description": "alert when disk usage exceeds 90%",
+    }),
+}
+
+
+# The payload field holding each scenario's prompt or config text
+PROMPT_FIELDS = ("message", "description", "requirements", "config", "task_description", "config_content")
+
+
+def unique_payload(payload: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """The payload with its prompt marked by the request index.
+
+    Identical requests in flight share one generation, so without this
+    concurrent workers would measure waiting on each other's result.
+    """
+    payload = dict(payload)
+    for field in PROMPT_FIELDS:
+        if field in payload:
+            payload[field] = f"{payload[field]} #{index}"
+    return payload
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Parse a Server-Timing header into {phase: seconds}"""
+    phases = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                phases[name] = float(value) / 1000.0
+    return phases
+
+
+def rss_mb() -> Dict[str, Optional[float]]:
+    """Current and peak resident set size of this process"""
+    current = None
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak_mb = peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+    return {"current": current, "peak": peak_mb}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_app(model_dir: Path):
+    """Import the app configured for the stub model and without rate limiting"""
+    os.environ["AI_MODEL_NAME"] = str(model_dir)
+    os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+    os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+    # Benchmark requests are independent; a shared history would grow every prompt past the stub's context
+    os.environ.setdefault("CONVERSATION_HISTORY_TURNS", "0")
+    # Cached config findings from earlier runs or warm-up requests would skip generation
+    os.environ.setdefault("CONFIG_CACHE_DIR", "")
+    from app.main import app
+    return app
+
+
+async def run_scenario(client, path: str, payload: Dict[str, Any],
+                       requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    errors = 0
+    remaining = list(range(requests))
+
+    async def worker():
+        nonlocal errors
+        while remaining:
+            index = remaining.pop()
+            start = time.perf_counter()
+            response = await client.post(path, json=unique_payload(payload, index))
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                errors += 1
+                continue
+            latencies.append(elapsed)
+            phases = parse_server_timing(response.headers.get("server-timing", ""))
+            if "prefill" in phases:
+                ttfts.append(elapsed - sum(phases.get(p, 0.0) for p in POST_FIRST_TOKEN_PHASES))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    return {
+        "path": path,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": len(latencies) / wall if wall > 0 else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "ttft_p50": percentile(ttfts, 50),
+        "ttft_p95": percentile(ttfts, 95),
+    }
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    import httpx
+
+    model_dir = build_stub_model(args.model_dir)
+    load_start = time.perf_counter()
+    app = load_app(model_dir)
+    startup = time.perf_counter() - load_start
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "startup_seconds": startup,
+        },
+        "scenarios": {},
+    }
+
+    cookies = {"passkey": args.passkey}
+    async with httpx.AsyncClient(app=app, base_url="http://bench", cookies=cookies, timeout=None) as client:
+        selected = args.scenarios or list(SCENARIOS)
+        for name in selected:
+            path, payload = SCENARIOS[name]
+            # Warm up so lazy initialization does not land in the measurements
+            await run_scenario(client, path, payload, args.warmup, 1)
+            results["scenarios"][name] = await run_scenario(
+                client, path, payload, args.requests, args.concurrency
+            )
+            print(format_row(name, results["scenarios"][name]))
+
+    results["rss_mb"] = rss_mb()
+    return results
+
+
+def format_row(name: str, result: Dict[str, Any]) -> str:
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.1f}ms"
+    return (f"{name:<20} {result['throughput_rps']:7.2f} req/s  "
+            f"p50 {ms(result['latency_p50'])}  p95 {ms(result['latency_p95'])}  "
+            f"p99 {ms(result['latency_p99'])}  ttft p50 {ms(result['ttft_p50'])}  "
+            f"errors {result['errors']}")
+
+
+def failures(results: Dict[str, Any]) -> List[str]:
+    """List scenarios with failed requests"""
+    return [f"{name}: {result['errors']} of {result['requests']} requests failed"
+            for name, result in results["scenarios"].items() if result["errors"]]
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """List scenarios that regressed by more than threshold (a fraction) or failed requests in either run"""
+    regressions = failures(current)
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if base.get("errors"):
+            regressions.append(f"{name}: {base['errors']} of {base['requests']} baseline requests failed")
+        for key in ("latency_p50", "latency_p95", "ttft_p50"):
+            if result.get(key) and base.get(key) and result[key] > base[key] * (1 + threshold):
+                regressions.append(f"{name}: {key} {base[key] * 1000:.1f}ms -> {result[key] * 1000:.1f}ms")
+        if base.get("throughput_rps") and result["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {base['throughput_rps']:.2f} -> {result['throughput_rps']:.2f} req/s"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test for the Sumiya API")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests per scenario")
+    parser.add_argument("--scenarios", nargs="*", choices=sorted(SCENARIOS))
+    parser.add_argument("--model-dir", type=Path, default=DEFAULT_DIR)
+    parser.add_argument("--passkey", default=os.getenv("DEFAULT_PASSKEY", "sinbad"))
+    parser.add_argument("--output", type=Path, help="write results JSON here")
+    parser.add_argument("--compare", type=Path, help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed relative regression before failing (default 0.10)")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_benchmark(args))
+    print(f"rss current {results['rss_mb']['current']} MB, peak {results['rss_mb']['peak']:.1f} MB")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    elif failures(results):
+        for line in failures(results):
+            print(f"FAILED {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""Local OpenAI-compatible completion server for exercising INFERENCE_BACKEND=http.
+
+Streams canned text from /v1/completions with configurable per-token latency
+and a configurable share of failing requests, so retries, timeouts and the
+circuit breaker fallback can be checked without a real inference server.
+
+    python -m benchmarks.stub_completion_server --port 8080 --token-delay 0.02 --failure-rate 0.2
+    INFERENCE_BACKEND=http INFERENCE_SERVER_URL=http://127.0.0.1:8080 python -m benchmarks.run
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+REPLY = (
+    "Check which process holds the port first:\n```bash\nsudo ss -ltnp 'sport = :8080'\n```\n"
+    "Then stop or reconfigure that service.\nUser: this turn should never reach the client"
+)
+
+
+def create_app(token_delay: float = 0.01, first_token_delay: float = 0.05, failure_rate: float = 0.0,
+               reply: str = REPLY) -> Starlette:
+    """Build the stub server; the settings are read again on every request"""
+    state = {
+        "token_delay": token_delay,
+        "first_token_delay": first_token_delay,
+        "failure_rate": failure_rate,
+        "requests": 0,
+    }
+
+    async def completions(request: Request):
+        state["requests"] += 1
+        if random.random() < state["failure_rate"]:
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=503)
+
+        body = await request.json()
+        max_tokens = body.get("max_tokens") or 16
+        n = body.get("n") or 1
+        stops = body.get("stop") or []
+        if isinstance(stops, str):
+            stops = [stops]
+
+        # Whitespace-delimited words stand in for tokens
+        text = reply
+        for stop in stops:
+            if stop in text:
+                text = text[:text.index(stop)]
+        words = text.split(" ")
+        finish_reason = "stop" if len(words) <= max_tokens else "length"
+        words = words[:max_tokens]
+        tokens = [word + " " for word in words[:-1]] + words[-1:]
+
+        async def events():
+            created = int(time.time())
+            await asyncio.sleep(state["first_token_delay"])
+            for token in tokens:
+                choices = [{"index": i, "text": token, "finish_reason": None} for i in range(n)]
+                yield _sse({"object": "text_completion", "created": created, "choices": choices})
+                await asyncio.sleep(state["token_delay"])
+            choices = [{"index": i, "text": "", "finish_reason": finish_reason} for i in range(n)]
+            yield _sse({"object": "text_completion", "created": created, "choices": choices})
+            usage = {"prompt_tokens": len(body.get("prompt", "").split()), "completion_tokens": len(tokens) * n}
+            yield _sse({"object": "text_completion", "created": created, "choices": [], "usage": usage})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    app = Starlette(routes=[Route("/v1/completions", completions, methods=["POST"])])
+    app.state.stub = state
+    return app
+
+
+def _sse(payload) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible completion server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between streamed tokens")
+    parser.add_argument("--first-token-delay", type=float, default=0.05, help="seconds before the first token")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with 503")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    uvicorn.run(create_app(args.token_delay, args.first_token_delay, args.failure_rate),
+                host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
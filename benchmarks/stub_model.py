@@ -0,0 +1,85 @@
+"""Build a tiny randomly initialized causal LM for offline benchmarking.
+
+The model and a byte-level tokenizer are created from a local config, so
+nothing is downloaded. Latency numbers measured against it reflect the
+serving stack (HTTP, scheduling, tokenization, generate loop overhead)
+rather than real model quality.
+"""
+import argparse
+import json
+from pathlib import Path
+
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+EOS_TOKEN = "<|endoftext|>"
+MODEL_INPUT_NAMES = ["input_ids", "attention_mask"]
+DEFAULT_DIR = Path(__file__).parent / ".stub_model"
+# The tokenizer spends one token per byte: the longest benchmark prompt (about 600 bytes without
+# conversation history) plus the largest generation budget (768 tokens for scripts) must fit
+DEFAULT_POSITIONS = 2048
+
+
+def build_tokenizer() -> PreTrainedTokenizerFast:
+    """Byte-level tokenizer with one token per byte and no merges"""
+    alphabet = pre_tokenizers.ByteLevel.alphabet()
+    vocab = {char: i for i, char in enumerate(sorted(alphabet))}
+    vocab[EOS_TOKEN] = len(vocab)
+
+    tokenizer = Tokenizer(models.BPE(vocab=vocab, merges=[]))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        bos_token=EOS_TOKEN,
+        eos_token=EOS_TOKEN,
+        unk_token=EOS_TOKEN,
+        # Like GPT-2's own tokenizer; ONNX exports of the model take no token_type_ids
+        model_input_names=MODEL_INPUT_NAMES
+    )
+
+
+def build_stub_model(
+    output_dir: Path = DEFAULT_DIR,
+    n_layer: int = 2,
+    n_embd: int = 64,
+    n_head: int = 2,
+    n_positions: int = DEFAULT_POSITIONS,
+    seed: int = 0
+) -> Path:
+    """Save a tiny GPT-2 style model and tokenizer to output_dir, unless one of this shape is there"""
+    output_dir = Path(output_dir)
+    if (output_dir / "config.json").exists():
+        saved = GPT2Config.from_pretrained(output_dir)
+        tokenizer_config = json.loads((output_dir / "tokenizer_config.json").read_text())
+        if ((saved.n_layer, saved.n_embd, saved.n_head, saved.n_positions) == (n_layer, n_embd, n_head, n_positions)
+                and tokenizer_config.get("model_input_names") == MODEL_INPUT_NAMES):
+            return output_dir
+
+    torch.manual_seed(seed)
+    tokenizer = build_tokenizer()
+    config = GPT2Config(
+        vocab_size=len(tokenizer),
+        n_positions=n_positions,
+        n_embd=n_embd,
+        n_layer=n_layer,
+        n_head=n_head,
+        bos_token_id=tokenizer.eos_token_id,
+        eos_token_id=tokenizer.eos_token_id
+    )
+    model = GPT2LMHeadModel(config)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    return output_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_DIR)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--hidden", type=int, default=64)
+    args = parser.parse_args()
+    print(build_stub_model(args.output_dir, n_layer=args.layers, n_embd=args.hidden))
\ No newline at end of file
@@ -260,6 +260,9 @@ start_app() {
     # Create necessary directories
     mkdir -p logs model_cache
     
+    # Build fingerprinted, precompressed static assets
+    python -m app.core.static || warning "Static asset build failed, serving unhashed assets"
+    
     # Start the application
     nohup uvicorn app.main:app --host 0.0.0.0 --port 8000 > logs/sumiya.log 2>&1 &
     
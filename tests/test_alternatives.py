@@ -0,0 +1,35 @@
+from app.services.alternatives import is_shell_script, rank_alternatives
+
+BROKEN_SHELL = "```bash\nif [ -f /etc/hosts ]; then\n  cat /etc/hosts\n```"
+VALID_SHELL = "```bash\ncat /etc/hosts\n```"
+# A Dockerfile in an unlabeled fence, which bash -n rejects
+DOCKERFILE = "```\nFROM python:3.11-slim\nRUN pip install -r requirements.txt\nCMD [\"python\", \"app.py\"]\n```"
+YAML = "```\nservices:\n  app:\n    image: app:latest\n```"
+
+
+def test_shell_answers_that_parse_rank_first():
+    ranked = rank_alternatives([BROKEN_SHELL, VALID_SHELL], [-0.1, -2.0], shell=True)
+    assert ranked == [VALID_SHELL, BROKEN_SHELL]
+
+
+def test_unlabeled_shell_block_is_checked_for_shell_requests():
+    broken = BROKEN_SHELL.replace("```bash", "```")
+    valid = VALID_SHELL.replace("```bash", "```")
+    assert rank_alternatives([broken, valid], [-0.1, -2.0], shell=True) == [valid, broken]
+
+
+def test_other_answers_rank_by_logprob_alone():
+    assert rank_alternatives([DOCKERFILE, YAML], [-0.5, -0.2]) == [YAML, DOCKERFILE]
+    assert rank_alternatives([BROKEN_SHELL, VALID_SHELL], [-0.1, -2.0]) == [BROKEN_SHELL, VALID_SHELL]
+
+
+def test_duplicates_collapse_to_the_likelier_one():
+    same = VALID_SHELL.replace("cat", "cat ")
+    assert rank_alternatives([VALID_SHELL, same], [-1.0, -0.5], shell=True) == [same]
+
+
+def test_shell_script_types():
+    assert is_shell_script("Bash")
+    assert is_shell_script("shell")
+    assert not is_shell_script("dockerfile")
+    assert not is_shell_script("python")
\ No newline at end of file
@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("optimum.onnxruntime")
+
+from app.core.config import settings
+from app.services.backends.base import GenerationRequest, create_backend
+from app.services.generation import GenerationProfile
+from benchmarks.backend_parity import PROMPTS
+from benchmarks.stub_model import build_stub_model
+
+NEW_TOKENS = 16
+
+
+@pytest.fixture(scope="module")
+def loaded(tmp_path_factory):
+    """The stub model loaded by the PyTorch and ONNX Runtime backends"""
+    model_name = str(build_stub_model(tmp_path_factory.mktemp("stub_model"), n_positions=256))
+    export_dir = str(tmp_path_factory.mktemp("onnx"))
+    torch, onnx = create_backend("torch"), create_backend("onnx")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(settings, "ONNX_EXPORT_DIR", export_dir)
+        try:
+            onnx_loaded = onnx.load(model_name)
+        except Exception as e:
+            # Parity is what is tested here; an optimum release that cannot export with this torch is not
+            pytest.skip(f"ONNX export failed with the installed optimum and torch: {e!r}")
+    return {"torch": (torch, *torch.load(model_name)), "onnx": (onnx, *onnx_loaded)}
+
+
+@pytest.mark.parametrize("prompt", PROMPTS)
+def test_onnx_greedy_tokens_match_torch(loaded, prompt):
+    _, reference, tokenizer = loaded["torch"]
+    _, ort_model, _ = loaded["onnx"]
+    inputs = tokenizer(prompt, return_tensors="pt")
+    kwargs = dict(max_new_tokens=NEW_TOKENS, min_new_tokens=NEW_TOKENS, do_sample=False,
+                  pad_token_id=tokenizer.eos_token_id)
+    expected = reference.generate(**inputs, **kwargs)[0].tolist()
+    assert ort_model.generate(**inputs, **kwargs)[0].tolist() == expected
+
+
+@pytest.mark.parametrize("prompt", PROMPTS)
+def test_onnx_backend_result_matches_torch(loaded, prompt):
+    # No stop strings, so both backends decode the full budget
+    request = GenerationRequest(prompt, GenerationProfile(NEW_TOKENS, stop_strings=()), do_sample=False)
+    results = {name: backend.generate(model, tokenizer, request)
+               for name, (backend, model, tokenizer) in loaded.items()}
+    assert results["onnx"].texts == results["torch"].texts
+    assert results["onnx"].finish_reasons == results["torch"].finish_reasons
+    assert results["onnx"].completion_tokens == results["torch"].completion_tokens
\ No newline at end of file
@@ -0,0 +1,77 @@
+from app.services.backends.http_backend import CircuitBreaker
+
+
+def elapse_reset(breaker):
+    """Move the breaker's opening back so its reset period has passed"""
+    breaker.opened_at -= breaker.reset_seconds
+
+
+def test_opens_after_threshold_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    elapse_reset(breaker)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_successful_trial_closes():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    elapse_reset(breaker)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=30)
+    for _ in range(5):
+        breaker.record_failure()
+    elapse_reset(breaker)
+    assert breaker.allow()
+    # One failed trial is enough, whatever the threshold
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_abandoned_trial_does_not_wedge_half_open():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    elapse_reset(breaker)
+    assert breaker.allow()
+
+    breaker.record_abandoned()
+    assert breaker.state == CircuitBreaker.OPEN
+    elapse_reset(breaker)
+    assert breaker.allow()
+
+
+def test_abandoned_call_while_closed_is_not_a_failure():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    assert breaker.allow()
+    breaker.record_abandoned()
+    assert breaker.failures == 0
+    assert breaker.state == CircuitBreaker.CLOSED
\ No newline at end of file
@@ -0,0 +1,127 @@
+from app.services.config_analysis import (
+    MAX_BLOCK_CHARS, MIN_BLOCK_CHARS, ConfigAnalysisCache, ConfigBlock, split_config
+)
+
+SSHD_CONFIG = """\
+# sshd_config
+Port 22
+ListenAddress 0.0.0.0
+
+PermitRootLogin no
+PasswordAuthentication no
+
+X11Forwarding no
+PrintMotd no
+
+Subsystem sftp /usr/lib/openssh/sftp-server
+"""
+
+
+def nginx_config(servers: int, directives: int) -> str:
+    """An http section holding the given number of server sections"""
+    lines = ["user nginx;", "http {", "    sendfile on;"]
+    for i in range(servers):
+        lines.append("    server {")
+        lines.append(f"        server_name site{i}.example.com;")
+        lines += [f"        add_header X-Example-{j} value-{j};" for j in range(directives)]
+        lines.append("    }")
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def test_short_paragraph_config_stays_one_block():
+    blocks = split_config(SSHD_CONFIG)
+    assert len(blocks) == 1
+    assert blocks[0].context == ()
+    assert "Subsystem sftp" in blocks[0].text
+
+
+def test_large_paragraphs_are_not_merged():
+    paragraphs = ["\n".join(f"Option{p}_{i} yes" for i in range(40)) for p in range(2)]
+    blocks = split_config("\n\n".join(paragraphs))
+    assert len(blocks) == 2
+    assert all(len(block.text) >= MIN_BLOCK_CHARS for block in blocks)
+
+
+def test_small_file_section_is_one_block():
+    blocks = split_config(nginx_config(servers=2, directives=1))
+    assert [block.context for block in blocks] == [()]
+
+
+def test_large_section_splits_into_its_children():
+    config = nginx_config(servers=4, directives=12)
+    assert len(config) > MAX_BLOCK_CHARS
+    blocks = split_config(config)
+    assert all(len(block.text) < MAX_BLOCK_CHARS for block in blocks)
+    nested = [block for block in blocks if block.context == ("http {",)]
+    assert nested
+    assert all(block.text.strip().startswith("server {") for block in nested)
+    assert all(any(f"site{i}.example.com" in block.text for block in nested) for i in range(4))
+
+
+def test_blocks_in_different_sections_are_not_merged():
+    config = nginx_config(servers=4, directives=12)
+    for block in split_config(config):
+        if block.context == ():
+            assert "server_name" not in block.text
+
+
+def test_apache_sections_are_detected():
+    config = "\n".join(
+        ["ServerRoot /etc/httpd", "<VirtualHost *:80>"]
+        + [f"    Header set X-Example-{i} value-{i}" for i in range(40)]
+        + ["</VirtualHost>", "<Directory /var/www>", "    Require all granted", "</Directory>"]
+    )
+    blocks = split_config(config)
+    assert any(block.text.strip().startswith("<VirtualHost") for block in blocks)
+    assert all(len(block.text) < MAX_BLOCK_CHARS for block in blocks if "<Directory" in block.text)
+
+
+def test_location_names_enclosing_sections():
+    block = ConfigBlock(("http {", "server {"), "    location / {\n        root /srv;\n    }")
+    assert block.location == "http > server > location /"
+
+
+def test_reindenting_keeps_the_key():
+    block = ConfigBlock(("http {",), "server {\n    listen 80;\n}")
+    reindented = ConfigBlock(("http {",), "\nserver {\n\tlisten 80;\n\n}\n")
+    key = ConfigAnalysisCache.key(block, "nginx", "model")
+    assert ConfigAnalysisCache.key(reindented, "nginx", "model") == key
+    assert ConfigAnalysisCache.key(block, "NGINX", "model") == key
+
+
+def test_key_covers_text_context_type_and_model():
+    block = ConfigBlock(("http {",), "server {\n    listen 80;\n}")
+    key = ConfigAnalysisCache.key(block, "nginx", "model")
+    assert ConfigAnalysisCache.key(ConfigBlock(("http {",), "server {\n    listen 443;\n}"), "nginx", "model") != key
+    assert ConfigAnalysisCache.key(ConfigBlock(("stream {",), block.text), "nginx", "model") != key
+    assert ConfigAnalysisCache.key(block, "apache", "model") != key
+    assert ConfigAnalysisCache.key(block, "nginx", "other-model") != key
+
+
+def test_cache_round_trip(tmp_path):
+    cache = ConfigAnalysisCache(str(tmp_path), max_entries=10)
+    block = ConfigBlock((), "Port 22")
+    key = cache.key(block, "sshd", "model")
+    assert cache.get(key) is None
+    cache.put(key, block, "Port 22 is the default.")
+    assert cache.get(key) == "Port 22 is the default."
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ConfigAnalysisCache("", max_entries=10)
+    block = ConfigBlock((), "Port 22")
+    key = cache.key(block, "sshd", "model")
+    cache.put(key, block, "findings")
+    assert cache.get(key) is None
+
+
+def test_prune_keeps_max_entries(tmp_path):
+    cache = ConfigAnalysisCache(str(tmp_path), max_entries=2)
+    keys = []
+    for i in range(4):
+        block = ConfigBlock((), f"Port {i}")
+        keys.append(cache.key(block, "sshd", "model"))
+        cache.put(keys[-1], block, f"findings {i}")
+    assert cache.prune() == 2
+    assert sum(cache.get(key) is not None for key in keys) == 2
\ No newline at end of file
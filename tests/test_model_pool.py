@@ -0,0 +1,63 @@
+import logging
+
+from app.services.model_pool import ModelPool, ModelTier
+
+MB = 2**20
+
+
+class Weights:
+    """Stands in for a loaded model of a given size"""
+
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+def sized_loader(sizes, loads):
+    def load(name):
+        loads.append(name)
+        return Weights(sizes[name]), None
+    return load
+
+
+def default_tier(model_name="large"):
+    return ModelTier("large", model_name, concurrency=1)
+
+
+def test_budget_below_the_default_model_is_raised_once(caplog):
+    loads = []
+    pool = ModelPool(sized_loader({"large": 100 * MB, "small": 10 * MB}, loads), 50 * MB)
+    with caplog.at_level(logging.WARNING, logger="app.services.model_pool"):
+        pool.pin_tier(default_tier())
+        assert pool.memory_budget_bytes == 100 * MB
+        for _ in range(3):
+            with pool.acquire("large"):
+                pass
+    assert len(caplog.records) == 1
+    assert loads == ["large"]
+    assert pool.is_loaded("large")
+
+
+def test_other_models_unload_once_idle_but_not_the_pinned_one():
+    loads = []
+    pool = ModelPool(sized_loader({"large": 100 * MB, "small": 10 * MB}, loads), 50 * MB)
+    pool.pin_tier(default_tier())
+    with pool.acquire("small"):
+        assert pool.is_loaded("small")
+    assert not pool.is_loaded("small")
+    assert pool.is_loaded("large")
+
+
+def test_pin_follows_the_tier_to_its_new_model():
+    pool = ModelPool(sized_loader({"large": 100 * MB, "large#2": 100 * MB}, []), 150 * MB)
+    tier = default_tier()
+    pool.pin_tier(tier)
+    with pool.acquire("large#2"):
+        tier.model_name = "large#2"
+    assert pool.is_loaded("large#2")
+    assert not pool.is_loaded("large")
+
+
+def test_budget_that_fits_the_default_model_is_kept():
+    pool = ModelPool(sized_loader({"large": 100 * MB}, []), 200 * MB)
+    pool.pin_tier(default_tier())
+    assert pool.memory_budget_bytes == 200 * MB
\ No newline at end of file
@@ -0,0 +1,69 @@
+import asyncio
+import types
+
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import MemoryBucketStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the monotonic clock the bucket store reads; advance it with clock.now += seconds"""
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(rate_limit, "time", fake)
+    return fake
+
+
+def consume(store, key, cost=1.0):
+    return asyncio.run(store.consume(key, cost))
+
+
+def test_burst_up_to_capacity_then_refused(clock):
+    store = MemoryBucketStore(rate=1.0, capacity=3)
+    assert [consume(store, "a")[0] for _ in range(3)] == [True] * 3
+    allowed, retry_after = consume(store, "a")
+    assert not allowed
+    assert retry_after == pytest.approx(1.0)
+
+
+def test_bucket_refills_at_rate(clock):
+    store = MemoryBucketStore(rate=0.5, capacity=2)
+    consume(store, "a", 2)
+    assert not consume(store, "a")[0]
+    clock.now += 2
+    assert consume(store, "a")[0]
+    assert not consume(store, "a")[0]
+
+
+def test_refill_is_capped_at_capacity(clock):
+    store = MemoryBucketStore(rate=1.0, capacity=2)
+    consume(store, "a")
+    clock.now += 100
+    assert consume(store, "a", 2)[0]
+    assert not consume(store, "a")[0]
+
+
+def test_retry_after_covers_the_missing_tokens(clock):
+    store = MemoryBucketStore(rate=2.0, capacity=4)
+    consume(store, "a", 3)
+    allowed, retry_after = consume(store, "a", 4)
+    assert not allowed
+    assert retry_after == pytest.approx(1.5)
+
+
+def test_clients_have_separate_buckets(clock):
+    store = MemoryBucketStore(rate=1.0, capacity=1)
+    assert consume(store, "a")[0]
+    assert not consume(store, "a")[0]
+    assert consume(store, "b")[0]
+
+
+def test_full_buckets_are_pruned_beyond_max_keys(clock):
+    store = MemoryBucketStore(rate=1.0, capacity=1, max_keys=2)
+    consume(store, "a")
+    consume(store, "b")
+    clock.now += 5
+    consume(store, "c")
+    assert set(store._buckets) == {"c"}
\ No newline at end of file
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.services.scheduler import FairShareScheduler, parse_client_weights
+
+
+async def grant_order(scheduler, requests):
+    """Queue (key, cost) requests behind a held slot, release it and return the keys in grant order"""
+    order = []
+    release = asyncio.Event()
+
+    async def hold():
+        async with scheduler.slot("holder", 1):
+            await release.wait()
+
+    async def request(key, cost):
+        async with scheduler.slot(key, cost):
+            order.append(key)
+            await asyncio.sleep(0)
+
+    holder = asyncio.ensure_future(hold())
+    await asyncio.sleep(0)
+    tasks = [asyncio.ensure_future(request(key, cost)) for key, cost in requests]
+    await asyncio.sleep(0)
+    assert scheduler.pending == len(requests)
+    release.set()
+    await asyncio.gather(holder, *tasks)
+    return order
+
+
+def test_light_requests_are_not_starved_by_heavy_ones():
+    scheduler = FairShareScheduler(concurrency=1, quantum=256)
+    requests = [("heavy", 1024)] * 4 + [("light", 128)] * 4
+    order = asyncio.run(grant_order(scheduler, requests))
+    assert order == ["light"] * 4 + ["heavy"] * 4
+
+
+def test_equal_costs_alternate_between_clients():
+    scheduler = FairShareScheduler(concurrency=1, quantum=256)
+    requests = [("a", 256)] * 3 + [("b", 256)] * 3
+    order = asyncio.run(grant_order(scheduler, requests))
+    assert order == ["a", "b"] * 3
+
+
+def test_weight_scales_a_clients_share():
+    scheduler = FairShareScheduler(concurrency=1, quantum=256)
+    scheduler.set_weight("premium", 2)
+    requests = [("premium", 256)] * 4 + [("basic", 256)] * 4
+    order = asyncio.run(grant_order(scheduler, requests))
+    assert order[:6].count("premium") == 4
+
+
+def test_client_weights_from_settings_string():
+    assert parse_client_weights("") == {}
+    assert parse_client_weights("10.0.0.5=2, ::1=0.5") == {"ip:10.0.0.5": 2.0, "ip:::1": 0.5}
+    with pytest.raises(ValueError):
+        parse_client_weights("=2")
+
+
+def test_weights_given_at_construction_apply():
+    scheduler = FairShareScheduler(concurrency=1, quantum=256, weights={"premium": 2})
+    requests = [("premium", 256)] * 4 + [("basic", 256)] * 4
+    order = asyncio.run(grant_order(scheduler, requests))
+    assert order[:6].count("premium") == 4
+
+
+def test_timed_out_waiter_leaves_the_queue():
+    async def run():
+        scheduler = FairShareScheduler(concurrency=1)
+        async with scheduler.slot("a", 10):
+            with pytest.raises(asyncio.TimeoutError):
+                async with scheduler.slot("b", 10, max_wait=0.01):
+                    pass
+            assert scheduler.pending == 0
+            assert scheduler.backlog() == 5
+        assert scheduler.running == 0
+        assert scheduler.backlog() == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_does_not_take_a_slot():
+    async def run():
+        scheduler = FairShareScheduler(concurrency=1)
+        granted = []
+
+        async def request(key):
+            async with scheduler.slot(key, 10):
+                granted.append(key)
+
+        async with scheduler.slot("a", 10):
+            cancelled = asyncio.ensure_future(request("b"))
+            waiting = asyncio.ensure_future(request("c"))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.sleep(0)
+        await waiting
+        assert granted == ["c"]
+        assert scheduler.running == 0
+
+    asyncio.run(run())
\ No newline at end of file
@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight, normalize_prompt
+
+
+class Refused(Exception):
+    """Stands in for an error that belongs to the caller that raised it, like its deadline"""
+
+
+class Counted:
+    """An async call that counts its runs and finishes when released"""
+
+    def __init__(self, result="answer"):
+        self.result = result
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.result
+
+
+def test_normalize_prompt_collapses_whitespace():
+    assert normalize_prompt("  restart\tnginx \n now ") == "restart nginx now"
+    assert normalize_prompt("restart nginx now") == normalize_prompt("restart  nginx\nnow")
+
+
+def test_identical_calls_share_one_run():
+    async def run():
+        flights = SingleFlight("test")
+        call = Counted()
+        tasks = [asyncio.ensure_future(flights.do("key", call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        call.release.set()
+        assert await asyncio.gather(*tasks) == ["answer"] * 3
+        assert call.calls == 1
+        assert len(flights) == 0
+
+    asyncio.run(run())
+
+
+def test_different_keys_run_separately():
+    async def run():
+        flights = SingleFlight("test")
+        call = Counted()
+        call.release.set()
+        await asyncio.gather(flights.do("a", call), flights.do("b", call))
+        assert call.calls == 2
+
+    asyncio.run(run())
+
+
+def test_cancelling_the_leader_keeps_the_call_for_followers():
+    async def run():
+        flights = SingleFlight("test")
+        call = Counted()
+        leader = asyncio.ensure_future(flights.do("key", call))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("key", call))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        assert leader.cancelled()
+        assert not call.cancelled
+
+        call.release.set()
+        assert await follower == "answer"
+        assert call.calls == 1
+
+    asyncio.run(run())
+
+
+def test_call_is_cancelled_once_every_caller_has_gone():
+    async def run():
+        flights = SingleFlight("test")
+        call = Counted()
+        callers = [asyncio.ensure_future(flights.do("key", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert call.cancelled
+        assert len(flights) == 0
+
+        # The next caller starts afresh instead of joining the cancelled call
+        call.release.set()
+        assert await flights.do("key", call) == "answer"
+        assert call.calls == 2
+
+    asyncio.run(run())
+
+
+def test_follower_waits_no_longer_than_its_own_timeout():
+    async def run():
+        flights = SingleFlight("test")
+        call = Counted()
+        leader = asyncio.ensure_future(flights.do("key", call))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await flights.do("key", call, timeout=0.01)
+        assert not call.cancelled
+
+        call.release.set()
+        assert await leader == "answer"
+
+    asyncio.run(run())
+
+
+def test_leader_timeout_is_not_applied_to_its_own_call():
+    async def run():
+        flights = SingleFlight("test")
+        call = Counted()
+        leader = asyncio.ensure_future(flights.do("key", call, timeout=0.01))
+        await asyncio.sleep(0.05)
+        call.release.set()
+        assert await leader == "answer"
+
+    asyncio.run(run())
+
+
+def test_follower_reruns_a_call_that_failed_with_an_unshared_error():
+    async def run():
+        flights = SingleFlight("test", unshared_errors=(Refused,))
+        runs = []
+
+        async def refused_first():
+            runs.append(None)
+            await asyncio.sleep(0.01)
+            if len(runs) == 1:
+                raise Refused()
+            return "answer"
+
+        leader = asyncio.ensure_future(flights.do("key", refused_first))
+        await asyncio.sleep(0)
+        assert await flights.do("key", refused_first, timeout=1) == "answer"
+        with pytest.raises(Refused):
+            await leader
+        assert len(runs) == 2
+
+    asyncio.run(run())
+
+
+def test_followers_share_other_errors():
+    async def run():
+        flights = SingleFlight("test", unshared_errors=(Refused,))
+        runs = []
+
+        async def broken():
+            runs.append(None)
+            await asyncio.sleep(0.01)
+            raise ValueError("backend down")
+
+        callers = [asyncio.ensure_future(flights.do("key", broken)) for _ in range(2)]
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert len(runs) == 1
+
+    asyncio.run(run())
\ No newline at end of file